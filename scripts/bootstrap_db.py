@@ -0,0 +1,16 @@
+"""One-time database bootstrap, run at deploy time before starting the orchestrator.
+
+Usage: PYTHONPATH=src python scripts/bootstrap_db.py
+"""
+from app.utils.logging import logger
+from app.utils.postgress import Postgress
+
+
+def main():
+    # The pooled connection's search_path starts with the workflow schema; pin the extension to public
+    Postgress().execute_query('CREATE EXTENSION IF NOT EXISTS vector SCHEMA public;')
+    logger.info('Database bootstrap complete: vector extension is installed.')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import json
+import functools
+import hashlib
+import threading
 import time
 from uuid import uuid4
+import orjson
 from mcp import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 import asyncio
@@ -10,16 +14,17 @@ from a2a.server.apps import A2AStarletteApplication
 from a2a.server.events import EventQueue
 from a2a.server.request_handlers import DefaultRequestHandler
 from a2a.server.tasks import DatabaseTaskStore, TaskUpdater
-from a2a.types import AgentCapabilities, AgentCard, AgentSkill, DataPart, Message, Part, Role, TaskState, TaskStatus, TaskStatusUpdateEvent
+from a2a.types import AgentCapabilities, AgentCard, AgentSkill, DataPart, Message, Part, Role, TaskState
 from a2a.utils import new_task
+from cachetools import TTLCache, cached
 from dotenv import find_dotenv, load_dotenv
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import create_async_engine
 from starlette.middleware.cors import CORSMiddleware
 import uvicorn
 
 from app.agent.run import main
-from app.agent.state import AgentState
+from app.agent.state import AGENT_STATE_FIELD_NAMES, AgentState
 from app.llm.azure_openai_client import AzureOpenAIClient   
 from app.llm.llm_client import LLMClientFactory
 from app.utils.agent_registry import AgentRegistry
@@ -39,6 +44,59 @@ if _dotenv_path:
 else:
     print("Warning: .env file not found (continuing without it)")
 
+
+@functools.lru_cache(maxsize=None)
+def _get_workflow_service() -> WorkflowService:
+    return WorkflowService()
+
+
+# Workflow definitions can be edited at runtime, so rendered prompts expire after a few minutes and are
+# dropped on WorkflowService.invalidate. The system message dict is shared between requests; the OpenAI SDK only reads it.
+_skill_prompt_cache: TTLCache = TTLCache(maxsize=256, ttl=300)
+_skill_prompt_lock = threading.Lock()
+
+
+def _clear_skill_prompts() -> None:
+    with _skill_prompt_lock:
+        _skill_prompt_cache.clear()
+
+
+WorkflowService.on_invalidate(_clear_skill_prompts)
+
+
+@cached(_skill_prompt_cache, lock=_skill_prompt_lock)
+def _render_skill_prompt(user_roles: Tuple[str, ...], skill_names: Tuple[str, ...]) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
+    tm = TemplateManager(SETTINGS.app_name)
+    workflows = _get_workflow_service().get_all_workflows(user_roles=user_roles)
+    prompt = tm.render_template(
+        TemplateType.PROMPT,
+        TemplateName.AGENT_SKILLS_CLASSIFIER_PROMPT,
+        capabilities=list(skill_names),
+        workflows=orjson.dumps(workflows).decode()
+    )
+    workflow_map = {workflow["workflow_id"]: workflow for workflow in workflows}
+    return {'role': 'system', 'content': prompt}, workflow_map
+
+_EMPTY_METADATA: Dict[str, Any] = {}
+
+# Connect/initialize happens once per session, so it gets a tighter bound than the per-request tool call.
+_MCP_CONNECT_TIMEOUT = 2
+_MCP_CALL_TIMEOUT = 5
+
+# Resolved (user_id, user_roles) keyed by a hash of the bearer token; the raw token is never stored.
+_user_info_cache: TTLCache = TTLCache(maxsize=10_000, ttl=180)
+_user_info_locks: Dict[str, asyncio.Lock] = {}
+
+# Batch API jobs poll for a long time; run them one at a time off the default executor
+_batch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='llm-batch')
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight.
+_background_tasks: set = set()
+
+# Latest background session save per context_id. Saves of one conversation run in order, and the next
+# turn waits for the pending one before loading, so it never reads (and later overwrites) stale state.
+_pending_saves: Dict[str, asyncio.Task] = {}
+
 class OrchestratorAgentExecutor(AgentExecutor):
     def __init__(self, agent_name: str):
 
@@ -58,6 +116,11 @@ class OrchestratorAgentExecutor(AgentExecutor):
             supports_authenticated_extended_card=False
         )
         self.agent_trace = None
+        # MCP session kept open for the process lifetime by a dedicated task; see _own_mcp_session
+        self._mcp_task: Optional[asyncio.Task] = None
+        self._mcp_ready: Optional[asyncio.Future] = None
+        self._mcp_closing: Optional[asyncio.Event] = None
+        self._mcp_lock = asyncio.Lock()
 
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
         try:
@@ -70,6 +133,9 @@ class OrchestratorAgentExecutor(AgentExecutor):
                 raise ValueError("User ID or User Roles could not be retrieved. Unauthorized access.")
             
             self.agent_trace = AgentTrace(state.context_id, state.agent_name, user_id=state.user_id)
+            pending_save = _pending_saves.get(state.context_id)
+            if pending_save is not None:
+                await asyncio.wait({pending_save})
             state = self.agent_trace.load_agent_session(state)
             
 
@@ -80,7 +146,7 @@ class OrchestratorAgentExecutor(AgentExecutor):
                 state.messages = state.current_state.get("messages", [])
                 state.selected_skill = state.current_state.get("selected_skill", "")
             else:    
-                state.selected_skill, state.workflow_id = self._classify_skill(state.input, user_roles=state.user_roles)
+                state.selected_skill, state.workflow_id = await self._classify_skill(state.input, user_roles=state.user_roles)
 
             conversation_name=f"Chat {datetime.now().strftime('%Y-%m-%d %H:%M')}"
             self.agent_trace.save_agent_session(state, conversation_name)    
@@ -141,30 +207,31 @@ class OrchestratorAgentExecutor(AgentExecutor):
 
     def _cast_to_agent_state(self, result: dict, base: AgentState) -> AgentState:
         for k, v in result.items():
-            if hasattr(base, k):
+            if k in AGENT_STATE_FIELD_NAMES:
                 setattr(base, k, v)
         return base
 
     def _create_message(self, agent_state:AgentState, for_partial: bool = False) -> Message:
-        metadata = {}
-        part = None
         if for_partial:
-            part = Part(root=DataPart(kind="data", data={"status": agent_state.status}, metadata=metadata))
+            return self._create_partial_message(agent_state)
+
+        metadata = agent_state.sub_agent_events if agent_state.sub_agent_events else {}
+        metadata[agent_state.agent_name] = agent_state.event_log
+        if isinstance(agent_state.output, AgentMessage):
+            agent_message = agent_state.output
+        elif "result" in agent_state.output:
+            logger.warning("Older message format detected, transforming to AgentMessage.")
+            agent_message = transform_results_to_agent_message(agent_state.output)
         else:
-            metadata = agent_state.sub_agent_events if agent_state.sub_agent_events else {}
-            metadata[agent_state.agent_name] = agent_state.event_log
             try:
-                if "result" in agent_state.output:
-                    raise ValueError("Older message format detected, transforming to AgentMessage.")
                 agent_message = AgentMessage(**agent_state.output)
             except Exception as e:
                 logger.warning(f"Failed to parse agent_state.output to AgentMessage: {e}")
                 agent_message = transform_results_to_agent_message(agent_state.output)
-            
-            agent_response=AgentResponse.create(data=agent_message, metadata=metadata)
-            #part = Part(root=DataPart(kind="data", data=agent_state.output, metadata=metadata))
-
         
+        agent_response=AgentResponse.create(data=agent_message, metadata=metadata)
+        #part = Part(root=DataPart(kind="data", data=agent_state.output, metadata=metadata))
+
         message = Message( role=Role.agent,
             message_id=str(uuid4()),
             task_id=agent_state.task_id,
@@ -173,6 +240,15 @@ class OrchestratorAgentExecutor(AgentExecutor):
         )
         return message   
 
+    def _create_partial_message(self, agent_state: AgentState) -> Message:
+        """Status-only message sent for each streaming fragment; skips the AgentMessage/AgentResponse build"""
+        return Message(role=Role.agent,
+            message_id=uuid4().hex,
+            task_id=agent_state.task_id,
+            context_id=agent_state.context_id,
+            parts=[Part(root=DataPart(kind="data", data={"status": agent_state.status}, metadata=_EMPTY_METADATA))]
+        )
+
     async def _run_workflow_without_streaming(self, agent_state: AgentState):
         result = await main(agent_state)
         agent_state = self._cast_to_agent_state(result, agent_state)        
@@ -183,24 +259,12 @@ class OrchestratorAgentExecutor(AgentExecutor):
         if not agent_state.task_state == TaskState.input_required.value:
             final=True
 
-        await agent_state.event_queue.enqueue_event(
-                    TaskStatusUpdateEvent(
-                        status=TaskStatus(
-                            state=agent_state.task_state,
-                            message=message,
-                        ),
-                        message=message,
-                        final=final,
-                        context_id=agent_state.context_id,
-                        task_id=agent_state.task_id,
-                    )
-            )
         task_updater = TaskUpdater(agent_state.event_queue, agent_state.task_id, agent_state.context_id)
         await task_updater.update_status( agent_state.task_state, message, final=final)
 
         agent_state.conversation.append({"role": "agent", "content": agent_state.output})
         agent_state.current_state = {"messages": agent_state.messages, "selected_skill": agent_state.selected_skill}
-        self.agent_trace.save_agent_session(agent_state) 
+        self._save_agent_session_in_background(agent_state)
 
     async def _run_workflow_with_streaming(self, agent_state: AgentState):
         async def stream_callback(partial_state: AgentState, task: any):
@@ -211,7 +275,7 @@ class OrchestratorAgentExecutor(AgentExecutor):
                 agent_state.status = fragment.get("status", agent_state.status)
 
             logger.debug(f"Streaming partial state current status:{agent_state.status}")
-            message = self._create_message(agent_state, for_partial=True)
+            message = self._create_partial_message(agent_state)
             updater = TaskUpdater(agent_state.event_queue, task.id, task.context_id)
             await updater.update_status(state = TaskState.working, message = message, final=False, timestamp = str(time.time()))
             #await agent_state.event_queue.enqueue_event(message)
@@ -224,11 +288,33 @@ class OrchestratorAgentExecutor(AgentExecutor):
         message = self._create_message(agent_state)
         agent_state.conversation.append({"role": "agent", "content": agent_state.output})
         agent_state.current_state = {"messages": agent_state.messages}
-        self.agent_trace.save_agent_session(agent_state) 
+        self._save_agent_session_in_background(agent_state)
 
         updater = TaskUpdater(agent_state.event_queue, agent_state.task_id, agent_state.context_id)
         await updater.update_status( TaskState.completed, message, final=True)
 
+    def _save_agent_session_in_background(self, agent_state: AgentState) -> None:
+        """Persist the session off the response path; the client does not wait for the DB write."""
+        context_id = agent_state.context_id
+        task = asyncio.create_task(self._save_after(_pending_saves.get(context_id), self.agent_trace.save_agent_session, agent_state))
+        _pending_saves[context_id] = task
+        _background_tasks.add(task)
+        task.add_done_callback(functools.partial(self._on_background_task_done, context_id))
+
+    @staticmethod
+    async def _save_after(previous: Optional[asyncio.Task], save, agent_state: AgentState) -> None:
+        if previous is not None:
+            await asyncio.wait({previous})
+        await asyncio.to_thread(save, agent_state)
+
+    @staticmethod
+    def _on_background_task_done(context_id: str, task: asyncio.Task) -> None:
+        _background_tasks.discard(task)
+        if _pending_saves.get(context_id) is task:
+            del _pending_saves[context_id]
+        if not task.cancelled() and task.exception():
+            logger.error(f"Background session save failed: {task.exception()}")
+
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
         raise ValueError('cancel not supported')
 
@@ -240,26 +326,36 @@ class OrchestratorAgentExecutor(AgentExecutor):
         if not token:
             raise ValueError("Authorization token is missing or empty.")
     
-    def _classify_skill(self, prompt: str, user_roles: List[str]) -> str:
-        tm = TemplateManager(SETTINGS.app_name)
-        workflow_manager = WorkflowService()
-        workflows = workflow_manager.get_all_workflows(user_roles=tuple(user_roles))
-
+    async def _classify_skill(self, prompt: str, user_roles: List[str]) -> str:
         # Extract skill descriptions from self.skills (AgentSkill objects)
-        skill_names = [skill.name for skill in self.skills]
-        
-        SKILL_CLASSIFIER_PROMPT = tm.render_template(
-            TemplateType.PROMPT, 
-            TemplateName.AGENT_SKILLS_CLASSIFIER_PROMPT,
-            capabilities=skill_names,
-            workflows=json.dumps(workflows)
-        )
+        skill_names = tuple(skill.name for skill in self.skills)
+
+        system_message, _ = _render_skill_prompt(tuple(sorted(user_roles)), skill_names)
         
         client = LLMClientFactory.create_client()
-        messages = [{'role': 'system', 'content': SKILL_CLASSIFIER_PROMPT}, {'role': 'user', 'content': prompt}]
+        messages = [system_message, {'role': 'user', 'content': prompt}]
         logger.info(f"Skill Prompt")
         logger.info(f"{messages}")
-        response = client.chat(messages)
+        response = await client.achat(messages)
+        return self._parse_skill_response(response)
+
+    async def classify_skills_batch(self, prompts: List[Tuple[str, List[str]]]) -> List[Tuple[str, Optional[str]]]:
+        """
+        Classify many (prompt, user_roles) pairs in one Batch API job, for bulk or offline re-classification.
+        Batch jobs can take hours, so this is never used on the interactive request path.
+        """
+        skill_names = tuple(skill.name for skill in self.skills)
+        requests = [
+            [_render_skill_prompt(tuple(sorted(user_roles)), skill_names)[0], {'role': 'user', 'content': prompt}]
+            for prompt, user_roles in prompts
+        ]
+        client = LLMClientFactory.create_client()
+        # Own executor: a long-polling batch must not hold threads that achat and session saves need
+        responses = await asyncio.get_running_loop().run_in_executor(_batch_executor, client.batch_chat, requests)
+        return [self._parse_skill_response(response) for response in responses]
+
+    @staticmethod
+    def _parse_skill_response(response: dict) -> Tuple[str, Optional[str]]:
         skill = response.get("skill","").strip()
         workflow_id = response.get("workflow_id", None)
         if skill in ['capability', 'workflow', 'other']:
@@ -267,22 +363,95 @@ class OrchestratorAgentExecutor(AgentExecutor):
         else:
             raise ValueError(f'Unrecognized skill: {skill}')
         
-    async def get_user_info(self, token: str) -> str:
-        async with asyncio.timeout(100):
+    async def _own_mcp_session(self, ready: asyncio.Future, closing: asyncio.Event) -> None:
+        """
+        Open the MCP session, publish it on `ready` and hold it until `closing` is set.
+        streamablehttp_client and ClientSession are anyio task groups that must be entered and
+        exited by the same task, so request handlers never enter them; they only await `ready`.
+        """
+        try:
             async with streamablehttp_client(SETTINGS.cubeassist_mcp_server_url) as (read, write, _):
                 async with ClientSession(read, write) as mcp_session:
                     await mcp_session.initialize()
+                    ready.set_result(mcp_session)
+                    await closing.wait()
+        except asyncio.CancelledError:
+            if not ready.done():
+                ready.set_exception(ConnectionError("MCP session was closed before it was initialized"))
+            raise
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.warning(f"MCP session closed with an error: {e}")
+
+    async def _get_mcp_session(self) -> ClientSession:
+        async with self._mcp_lock:
+            if self._mcp_task is None:
+                self._mcp_ready = asyncio.get_running_loop().create_future()
+                self._mcp_closing = asyncio.Event()
+                self._mcp_task = asyncio.create_task(self._own_mcp_session(self._mcp_ready, self._mcp_closing))
+            task, ready = self._mcp_task, self._mcp_ready
+        try:
+            # shield: a timed-out or cancelled waiter must not cancel the future other requests share
+            async with asyncio.timeout(_MCP_CONNECT_TIMEOUT):
+                return await asyncio.shield(ready)
+        except Exception:
+            await self._reset_mcp_session(task)
+            raise
+
+    async def _reset_mcp_session(self, task: Optional[asyncio.Task] = None) -> None:
+        """Close the current MCP session (or only `task`'s, if it is still current) so the next call reconnects"""
+        async with self._mcp_lock:
+            if self._mcp_task is None or (task is not None and task is not self._mcp_task):
+                return
+            task, ready, closing = self._mcp_task, self._mcp_ready, self._mcp_closing
+            self._mcp_task = self._mcp_ready = self._mcp_closing = None
+        closing.set()
+        if not ready.done():
+            task.cancel()
+        # The owner task exits the MCP contexts itself and logs any error; just wait for it to finish
+        await asyncio.wait({task})
+
+    async def get_user_info(self, token: str) -> Tuple[str, List[str]]:
+        key = hashlib.sha256(token.encode()).hexdigest()
+        user_info = _user_info_cache.get(key)
+        if user_info is None:
+            # One lookup per token at a time; concurrent requests wait for it and then hit the cache
+            lock = _user_info_locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                try:
+                    user_info = _user_info_cache.get(key)
+                    if user_info is None:
+                        user_info = await self._fetch_user_info(token)
+                        _user_info_cache[key] = user_info
+                finally:
+                    _user_info_locks.pop(key, None)
+        user_id, user_roles = user_info
+        return user_id, list(user_roles)
+
+    async def _fetch_user_info(self, token: str) -> Tuple[str, Tuple[str, ...]]:
+        for attempt in range(2):
+            mcp_session = await self._get_mcp_session()
+            try:
+                async with asyncio.timeout(_MCP_CALL_TIMEOUT):
                     result = await mcp_session.call_tool(
                         "get_user_info",
                         {"token": token}
                     )
-                    user_info = json.loads(result.content[0].text)
-                    user_id = user_info.get("output", {}).get("data", {}).get("userId")
-                    user_roles = user_info.get("output", {}).get("data", {}).get("roles", [])
-                    if not user_id or (user_roles and len(user_roles) == 0):
-                        raise ValueError("User ID or User Roles could not be retrieved. Unauthorized access.")
-                    return user_id, user_roles
-
+                break
+            except Exception as e:
+                # The cached session may have been dropped by the server; reconnect once
+                await self._reset_mcp_session()
+                if attempt:
+                    raise
+                logger.warning(f"MCP call failed, reconnecting: {e}")
+        user_data = orjson.loads(result.content[0].text).get("output", {}).get("data", {})
+        user_id = user_data.get("userId")
+        user_roles = user_data.get("roles", [])
+        if not user_id or (user_roles and len(user_roles) == 0):
+            raise ValueError("User ID or User Roles could not be retrieved. Unauthorized access.")
+        return user_id, tuple(user_roles)
 
 
 if __name__ == '__main__':
@@ -300,4 +469,10 @@ if __name__ == '__main__':
     allow_methods=["*"],
     allow_headers=["*"],
 )
-    uvicorn.run(app, host='0.0.0.0', port=8080)
+    try:
+        import uvloop  # noqa: F401
+        loop, http = "uvloop", "httptools"
+    except ImportError:
+        # uvloop has no wheels for some interpreters (e.g. free-threaded builds)
+        loop, http = "asyncio", "auto"
+    uvicorn.run(app, host='0.0.0.0', port=8080, loop=loop, http=http)
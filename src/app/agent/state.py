@@ -1,7 +1,8 @@
+import copy
 import json
 import time
 from asyncio import Task
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import Any, Callable, Dict, List, Optional
 
 from a2a.server.events import EventQueue
@@ -10,7 +11,7 @@ from a2a.types import TaskState
 from app.utils.settings import SETTINGS
 
 
-@dataclass
+@dataclass(slots=True)
 class CubeAssistBaseState:
     """Base class containing core conversation fields"""
     input: Optional[str] = None
@@ -22,7 +23,7 @@ class CubeAssistBaseState:
     is_new_conversation: bool = True
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentState(CubeAssistBaseState):
     """Agent state extending CubeAssist base state"""
     # for workflow state
@@ -68,37 +69,52 @@ class AgentState(CubeAssistBaseState):
         self.end_time = time.time()
 
     def to_dict(self) -> dict:
-        return asdict(self)
+        """Shallow field mapping; values are shared with the state, not deep-copied"""
+        return {name: getattr(self, name) for name in _AGENT_STATE_FIELDS}
+
+    def to_wire_dict(self) -> dict:
+        """Only the JSON-bound subset of the state sent back to clients"""
+        return {name: getattr(self, name) for name in _AGENT_STATE_WIRE_FIELDS}
 
     @staticmethod
     def get_initial_state():
-        return AgentState(
-            messages=[],
-            input=None,
-            output={},  # Changed from json.dumps({}) to {}
-            event_log=[],
-            sub_agent_events={},
-            available_agents={},
-            selected_agent="",
-            available_tools=[],
-            agent_tools=[],
-            selected_tool=None,
-            results=[],
-            token="",
-            step=0,
-            seen_decisions=set(),
-            status="in_progress",
-            agent_name=SETTINGS.app_name,
-            context_id=None,
-            task_state=TaskState.completed.value,
-            is_new_conversation=True,
-            conversation=[],
-            current_state={},
-            workflow_id=None,
-            user_roles=["CUBE_E2E_ADMIN"],
-            user_id=None,
-            selected_skill=None,
-            agent_description=None,
-            agent_skills={},
-            start_time=time.time()
-        )
+        # Shallow-copy the prebuilt template, then give the copy its own mutable containers
+        state = copy.copy(_INITIAL_STATE_TEMPLATE)
+        state.messages = []
+        state.output = {}
+        state.event_log = []
+        state.input_data = {}
+        state.sub_agent_events = {}
+        state.available_agents = {}
+        state.available_tools = []
+        state.agent_tools = []
+        state.results = []
+        state.seen_decisions = set()
+        state.conversation = []
+        state.current_state = {}
+        state.user_roles = ["CUBE_E2E_ADMIN"]
+        state.agent_skills = {}
+        state.start_time = time.time()
+        return state
+
+
+_AGENT_STATE_FIELDS = tuple(f.name for f in fields(AgentState))
+# Same names as a set, for membership tests on incoming result keys
+AGENT_STATE_FIELD_NAMES = frozenset(_AGENT_STATE_FIELDS)
+_AGENT_STATE_WIRE_FIELDS = ("output", "status", "task_state", "event_log", "selected_skill", "workflow_id")
+_INITIAL_STATE_TEMPLATE = AgentState(
+    input=None,
+    selected_agent="",
+    selected_tool=None,
+    token="",
+    step=0,
+    status="in_progress",
+    agent_name=SETTINGS.app_name,
+    context_id=None,
+    task_state=TaskState.completed.value,
+    is_new_conversation=True,
+    workflow_id=None,
+    user_id=None,
+    selected_skill=None,
+    agent_description=None,
+)
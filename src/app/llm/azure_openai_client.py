@@ -1,7 +1,8 @@
 import json
+import time
 from typing import Any, Dict, List
 
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, AzureOpenAI
 
 from app.llm.llm_client import BaseLLMClient
 from app.utils.settings import SETTINGS
@@ -9,11 +10,13 @@ from app.utils.settings import SETTINGS
 
 class AzureOpenAIClient(BaseLLMClient):
     def __init__(self, api_version: str = None, api_key: str = None, base_url: str = None, model: str = None):
-        self.client = AzureOpenAI(
+        client_kwargs = dict(
             azure_endpoint=base_url or SETTINGS.openai_endpoint,
             api_key=api_key or SETTINGS.openai_api_key,
             api_version=api_version or SETTINGS.openai_api_version,
         )
+        self.client = AzureOpenAI(**client_kwargs)
+        self.async_client = AsyncAzureOpenAI(**client_kwargs)
         self.model = model or SETTINGS.openai_llm_model
 
     def chat(self, messages: List[Dict[str, Any]], model=None, **kwargs) -> str:
@@ -21,6 +24,55 @@ class AzureOpenAIClient(BaseLLMClient):
         resp = self.client.chat.completions.create(model=model, messages=messages, **kwargs)
         return json.loads(resp.choices[0].message.content) or {}
 
+    async def achat(self, messages: List[Dict[str, Any]], model=None, **kwargs) -> str:
+        model = model or self.model
+        resp = await self.async_client.chat.completions.create(model=model, messages=messages, **kwargs)
+        return json.loads(resp.choices[0].message.content) or {}
+
+    def batch_chat(self, requests: List[List[Dict[str, Any]]], model=None, poll_interval: float = 10, timeout: float = 24 * 60 * 60, **kwargs) -> List[Dict[str, Any]]:
+        """Run many chat completions through the Batch API; results keep the order of requests"""
+        model = model or self.model
+        lines = [
+            json.dumps({"custom_id": str(i), "method": "POST", "url": "/chat/completions", "body": {"model": model, "messages": messages, **kwargs}})
+            for i, messages in enumerate(requests)
+        ]
+        batch_file = self.client.files.create(file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch")
+        batch = self.client.batches.create(input_file_id=batch_file.id, endpoint="/chat/completions", completion_window="24h")
+
+        deadline = time.monotonic() + timeout
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if time.monotonic() > deadline:
+                self.client.batches.cancel(batch.id)
+                raise TimeoutError(f"Batch {batch.id} did not complete within {timeout} seconds")
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch.id} finished with status {batch.status}")
+
+        # Successful lines go to the output file; failed requests go to the error file (or carry an error)
+        results: List[Any] = [None] * len(requests)
+        errors: List[str] = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get("response") or {}
+                body = response.get("body") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    errors.append(f'request {item["custom_id"]}: {item.get("error") or body.get("error")}')
+                    continue
+                results[int(item["custom_id"])] = json.loads(body["choices"][0]["message"]["content"]) or {}
+        if errors:
+            raise RuntimeError(f"Batch {batch.id} had {len(errors)} failed request(s): {'; '.join(errors)}")
+        missing = [str(i) for i, result in enumerate(results) if result is None]
+        if missing:
+            raise RuntimeError(f"Batch {batch.id} returned no result for request(s) {', '.join(missing)}")
+        return results
+
     def responses(self, messages: List[Dict[str, Any]], model=None, **kwargs) -> any:
         model = model or self.model
         resp = self.client.responses.create(model=model, input=messages, **kwargs)
@@ -1,3 +1,5 @@
+import asyncio
+import threading
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional, Union
 from enum import Enum
@@ -18,6 +20,14 @@ class BaseLLMClient(ABC):
     def chat(self, messages: list, **kwargs) -> Any:
         """Send chat completion request"""
         pass
+
+    async def achat(self, messages: list, **kwargs) -> Any:
+        """Send chat completion request without blocking the event loop"""
+        return await asyncio.to_thread(self.chat, messages, **kwargs)
+
+    def batch_chat(self, requests: List[list], **kwargs) -> List[Any]:
+        """Send many chat completion requests; results keep the order of requests. Clients with a batch API override this"""
+        return [self.chat(messages, **kwargs) for messages in requests]
     
     @staticmethod
     def mcp_tools_reformating(is_remote: bool, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -43,6 +53,10 @@ class BaseLLMClient(ABC):
         return openai_tools
 
 
+_client_singleton: Optional[BaseLLMClient] = None
+_client_lock = threading.Lock()
+
+
 class LLMClientFactory:
     """Factory class to create appropriate LLM client instances"""
     
@@ -51,16 +65,27 @@ class LLMClientFactory:
         **kwargs
     ) -> BaseLLMClient:
         """
-        Create an LLM client based on type
+        Return the shared LLM client, creating it on first use.
+        The client is reused so its HTTP connection pool stays warm across requests.
+        Passing kwargs always builds a dedicated, uncached client.
         
         Args:
-            llm_type: Type of LLM client to create
-            model: Model name to use
             **kwargs: Additional arguments passed to client
             
         Returns:
             Instantiated LLM client
         """
+        global _client_singleton
+        if kwargs:
+            return LLMClientFactory._build_client(**kwargs)
+        if _client_singleton is None:
+            with _client_lock:
+                if _client_singleton is None:
+                    _client_singleton = LLMClientFactory._build_client()
+        return _client_singleton
+
+    @staticmethod
+    def _build_client(**kwargs) -> BaseLLMClient:
         # Use settings defaults if not provided
         llm_type = SETTINGS.llm_type 
         
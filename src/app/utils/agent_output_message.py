@@ -1,5 +1,5 @@
-from typing import List, Optional, Union, Any, Dict, Literal
-from pydantic import BaseModel, Field
+from typing import Annotated, List, Optional, Union, Any, Dict, Literal
+from pydantic import BaseModel, Discriminator, Tag
 from a2a.types import Part, DataPart
 import json
 
@@ -67,7 +67,31 @@ class CapabilitiesBlock(BaseModel):
     capabilities: List[CapabilityCategory]
 
 
-ContentBlock = Union[TextBlock, TableBlock, FormBlock, RecommendationsBlock, CapabilitiesBlock]
+# Key that identifies each block when "type" is omitted (every block model defaults its type)
+_BLOCK_KEYS = (("text", "text"), ("data", "table"), ("fields", "form"), ("actions", "recommendations"), ("capabilities", "capabilities"))
+
+
+def _block_type(value: Any) -> Optional[str]:
+    """Tag of a content block: its "type", or inferred from its fields when "type" is missing"""
+    if not isinstance(value, dict):
+        return getattr(value, "type", None)
+    block_type = value.get("type")
+    if block_type is None:
+        block_type = next((tag for key, tag in _BLOCK_KEYS if key in value), None)
+    return block_type
+
+
+# Tagged on "type" so validation dispatches straight to the matching block model
+ContentBlock = Annotated[
+    Union[
+        Annotated[TextBlock, Tag("text")],
+        Annotated[TableBlock, Tag("table")],
+        Annotated[FormBlock, Tag("form")],
+        Annotated[RecommendationsBlock, Tag("recommendations")],
+        Annotated[CapabilitiesBlock, Tag("capabilities")],
+    ],
+    Discriminator(_block_type),
+]
 
 
 class Workflow(BaseModel):
@@ -7,26 +7,30 @@ from app.utils.postgress import Postgress
 
 class AgentRegistry:
     _instances = {}
-    _agent_data_cache = {}
+
+    GET_AGENT_BY_NAME = """
+        SELECT a.agent_id, a.name, a.description, a.skills, a.a2a_endpoint
+        FROM agent a
+        WHERE a.name = %s
+    """
 
     def __new__(self, agent_name: str):
         if agent_name not in self._instances:
-            self._instances[agent_name] = super().__new__(self)
+            instance = super().__new__(self)
+            instance._loaded = False
+            self._instances[agent_name] = instance
         return self._instances[agent_name]
 
     def __init__(self, agent_name: str):
+        if self._loaded:
+            return
         self.agent_name = agent_name
-        if len(self._agent_data_cache) == 0:
-            self._agent_data_cache = self._get_agent_data(agent_name)
+        self._agent_data_cache = self._get_agent_data(agent_name)
+        self._loaded = True
 
     def _get_agent_data(self, agent_name: str) -> dict:
         db = Postgress()
-        query = """
-            SELECT a.agent_id, a.name, a.description, a.skills, a.a2a_endpoint   
-            FROM agent a
-            WHERE a.name = %s
-        """
-        rows = db.execute_query(query, params=(agent_name,), fetch=True)
+        rows = db.execute_query(self.GET_AGENT_BY_NAME, params=(agent_name,), fetch=True)
 
         if not rows:
             logger.error(f"Agent '{agent_name}' not found in database")
@@ -34,19 +38,12 @@ class AgentRegistry:
 
         first_row = rows[0]
 
-        return {'agent_id': first_row[0], 'name': first_row[1], 'description': first_row[2], 'skills': first_row[3], 'endpoint': first_row[4]}
-
-    def get_name(self) -> str:
-        return self._agent_data_cache.get('name', '')
+        return {'agent_id': first_row[0], 'name': first_row[1], 'description': first_row[2], 'skills': self._parse_skills(first_row[3]), 'endpoint': first_row[4]}
 
-    def get_description(self) -> str:
-        return self._agent_data_cache.get('description', '')
-
-    def get_url(self) -> str:
-        return self._agent_data_cache.get('endpoint', '')
-
-    def get_skills(self) -> list[AgentSkill]:
-        skills_data = self._agent_data_cache.get('skills', [])
+    @staticmethod
+    def _parse_skills(skills_data) -> list[AgentSkill]:
+        if not skills_data:
+            return []
 
         # Parse JSON if string
         if isinstance(skills_data, str):
@@ -60,3 +57,15 @@ class AgentRegistry:
                 )
             )
         return skills
+
+    def get_name(self) -> str:
+        return self._agent_data_cache.get('name', '')
+
+    def get_description(self) -> str:
+        return self._agent_data_cache.get('description', '')
+
+    def get_url(self) -> str:
+        return self._agent_data_cache.get('endpoint', '')
+
+    def get_skills(self) -> list[AgentSkill]:
+        return self._agent_data_cache.get('skills', [])
@@ -1,12 +1,142 @@
 
+import atexit
+import csv
+import io
 import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import orjson
 from app.agent.state import AgentState
-from app.utils.postgress import Postgress
-from app.utils.utilities import Utilities
+from app.utils.logging import logger
+from app.utils.postgress import Postgress, json_param
 from a2a.types import Part
 from typing import List
 
+
+class _TraceWriter:
+    """Buffers trace rows and writes them with multi-row INSERTs from a background thread"""
+    BATCH_SIZE = 1000
+    PAGE_SIZE = 200
+    # Groups at least this large go through COPY when the caller supplied a COPY statement
+    COPY_THRESHOLD = 500
+    FLUSH_INTERVAL = 0.05
+    MAX_PENDING = 10_000
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=self.MAX_PENDING)
+        self._db = Postgress()
+        self._thread = threading.Thread(target=self._run, name='agent-trace-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    @classmethod
+    def instance(cls) -> "_TraceWriter":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def enqueue(self, query: str, template: str, row: tuple, copy_query: str = None, statement_name: str = None) -> None:
+        # Never block the caller (often the event loop); shed traces if the database falls behind
+        try:
+            self._queue.put_nowait((query, template, row, copy_query, statement_name))
+        except queue.Full:
+            logger.warning(f"Trace queue full ({self.MAX_PENDING} pending), dropping trace row")
+
+    def flush(self) -> None:
+        """Block until every queued row has been written (or failed)"""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: list) -> None:
+        grouped = {}
+        for query, template, row, copy_query, statement_name in batch:
+            grouped.setdefault((query, template, copy_query, statement_name), []).append(row)
+        for (query, template, copy_query, statement_name), rows in grouped.items():
+            try:
+                self._write_rows(query, template, copy_query, statement_name, rows)
+            except Exception as e:
+                if len(rows) == 1:
+                    logger.error(f"Failed to write trace row: {e}")
+                    continue
+                # One bad payload fails the whole statement; retry row by row so only that trace is lost
+                logger.warning(f"Failed to write {len(rows)} trace rows, retrying one at a time: {e}")
+                for row in rows:
+                    try:
+                        self._write_rows(query, template, copy_query, statement_name, [row])
+                    except Exception as e:
+                        logger.error(f"Failed to write trace row: {e}")
+        for _ in batch:
+            self._queue.task_done()
+
+    def _write_rows(self, query: str, template: str, copy_query: str, statement_name: str, rows: list) -> None:
+        if copy_query and len(rows) >= self.COPY_THRESHOLD:
+            self._db.copy_expert(copy_query, self._to_csv(rows))
+        elif statement_name and len(rows) == 1:
+            # Quiet periods flush one row at a time; skip the parse/plan with a prepared INSERT
+            self._db.execute_prepared(statement_name, self._single_row_query(query, template), rows[0])
+        else:
+            self._db.execute_values(query, rows, template=template, page_size=self.PAGE_SIZE)
+
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def _single_row_query(query: str, template: str) -> str:
+        return query.replace('VALUES %s', f'VALUES {template}')
+
+    @staticmethod
+    def _to_csv(rows: list) -> io.StringIO:
+        """CSV for COPY; None stays unquoted (NULL) and execution_time is appended to every row"""
+        execution_time = datetime.now(timezone.utc).isoformat()
+        buf = io.StringIO()
+        writer = csv.writer(buf, quoting=csv.QUOTE_NOTNULL, lineterminator='\n')
+        for row in rows:
+            writer.writerow([
+                orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode() if isinstance(value, (dict, list)) else value
+                for value in row
+            ] + [execution_time])
+        buf.seek(0)
+        return buf
+
+
 class AgentTrace:
+    INSERT_AGENT_INTERACTION_TRACE = """
+        INSERT INTO agent_interaction_trace
+        (context_id, task_id, source_agent_name, target_agent_name, input_payload, output_payload, status, execution_duration, execution_time)
+        VALUES %s
+    """
+    INSERT_AGENT_MCP_INTERACTION_TRACE = """
+        INSERT INTO agent_mcp_interaction_trace
+        (context_id, task_id, agent_name, tool_name, input_payload, output_payload, status, execution_duration, execution_time)
+        VALUES %s
+    """
+    COPY_AGENT_MCP_INTERACTION_TRACE = """
+        COPY agent_mcp_interaction_trace
+        (context_id, task_id, agent_name, tool_name, input_payload, output_payload, status, execution_duration, execution_time)
+        FROM STDIN WITH (FORMAT csv)
+    """
+    TRACE_ROW_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, now())"
+
     def __init__(self, context_id: str, agent_name: str, user_id: str = ''):
         self.context_id = context_id
         self.agent_name = agent_name
@@ -14,29 +144,24 @@ class AgentTrace:
         self.db = Postgress()
 
     def save_agent_interaction_trace(self, task_id: str, input_payload_str: str, output_payload: str, status: str, execution_duration: float, target_agent_name: str = '') -> None:
-
-        query = """
-            INSERT INTO agent_interaction_trace
-            (context_id, task_id, source_agent_name, target_agent_name, input_payload, output_payload, status, execution_duration, execution_time)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, now())
-        """
-        self.db.execute_query(query, params=(self.context_id, task_id, self.agent_name, target_agent_name, input_payload_str, 
-                                             output_payload, status, execution_duration), 
-                              fetch=False)
+        _TraceWriter.instance().enqueue(
+            self.INSERT_AGENT_INTERACTION_TRACE, self.TRACE_ROW_TEMPLATE,
+            (self.context_id, task_id, self.agent_name, target_agent_name, input_payload_str, output_payload, status, execution_duration),
+            statement_name='save_agent_interaction'
+        )
 
     def save_agent_mcp_interaction_trace(self, task_id: str, tool_name: str, input_payload: str, output_payload: str, status: str, execution_duration:float) -> None:
-        query = """
-            INSERT INTO agent_mcp_interaction_trace
-            (context_id, task_id, agent_name, tool_name, input_payload, output_payload, status, execution_duration, execution_time)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, now())
-        """
-        self.db.execute_query(query, params=(self.context_id, task_id, self.agent_name, tool_name, input_payload, output_payload, status, execution_duration), fetch=False)
+        _TraceWriter.instance().enqueue(
+            self.INSERT_AGENT_MCP_INTERACTION_TRACE, self.TRACE_ROW_TEMPLATE,
+            (self.context_id, task_id, self.agent_name, tool_name, input_payload, output_payload, status, execution_duration),
+            copy_query=self.COPY_AGENT_MCP_INTERACTION_TRACE, statement_name='save_agent_mcp_interaction'
+        )
 
     def save_agent_session( self, agent_state: AgentState, conversation_name: str = '') -> None:
         query = """
             INSERT INTO chat_session (context_id, conversation_name, user_id, 
                 agent_name, conversation, current_state, started_at, ended_at )
-                VALUES (%s, %s, %s, %s, %s::jsonb, %s::jsonb, now(), now())
+                VALUES (%s, %s, %s, %s, %s, %s, now(), now())
             ON CONFLICT (context_id, user_id, agent_name)
             DO UPDATE SET
                 conversation = EXCLUDED.conversation,
@@ -46,7 +171,7 @@ class AgentTrace:
         self.db.execute_query(
             query,
             params=( self.context_id, conversation_name, self.user_id, self.agent_name,
-                Utilities.json_or_none(agent_state.conversation), Utilities.json_or_none(agent_state.current_state)),
+                json_param(agent_state.conversation), agent_state.current_state),
             fetch=False
         )
 
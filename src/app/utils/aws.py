@@ -0,0 +1,65 @@
+import functools
+import os
+import re
+import subprocess
+import threading
+import time
+
+import boto3
+
+# Banner printed by session-manager-plugin once the local port is listening ("Starting session"
+# comes earlier, before the listener is bound)
+_READY_RE = re.compile(r'Waiting for connections')
+
+
+@functools.lru_cache(maxsize=None)
+def boto_client(service: str, aws_region: str):
+    """Shared boto3 client per (service, region); clients are thread-safe and expensive to build"""
+    return boto3.session.Session().client(service_name=service, region_name=aws_region)
+
+
+@functools.lru_cache(maxsize=16)
+def get_vm_instance(aws_region: str, tag_value: str = 'cubeassist-ec2-dev-profile') -> str:
+    """Id of the first EC2 instance whose Name tag is tag_value"""
+    ec2 = boto_client('ec2', aws_region)
+    # Filters are applied per page, so a page can come back empty while later pages match
+    pages = ec2.get_paginator('describe_instances').paginate(Filters=[{'Name': 'tag:Name', 'Values': [tag_value]}])
+    for page in pages:
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                return instance['InstanceId']
+    # Raise rather than return None: lru_cache would otherwise pin the miss for the process lifetime
+    raise RuntimeError(f'No EC2 instance tagged {tag_value!r} found in {aws_region}')
+
+
+def forward_port(server_cmd: list, timeout: float = 30) -> subprocess.Popen:
+    """Start the SSM session and return as soon as it reports it is ready to accept connections"""
+    env = os.environ.copy()
+    proc = subprocess.Popen(server_cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=1, text=True)
+    ready = threading.Event()
+    stderr_lines = []
+
+    def drain(stream, lines=None):
+        # Keep reading for the life of the session so the pipe never fills up and blocks the plugin
+        for line in stream:
+            if lines is not None:
+                lines.append(line)
+            elif _READY_RE.search(line):
+                ready.set()
+        ready.set()  # stream closed: the process exited, stop waiting
+
+    threading.Thread(target=drain, args=(proc.stdout,), daemon=True).start()
+    stderr_reader = threading.Thread(target=drain, args=(proc.stderr, stderr_lines), daemon=True)
+    stderr_reader.start()
+
+    deadline = time.monotonic() + timeout
+    while not ready.wait(timeout=0.1):
+        if proc.poll() is not None:
+            break
+        if time.monotonic() >= deadline:
+            proc.terminate()
+            raise RuntimeError(f'Port forwarding not ready after {timeout} seconds: {"".join(stderr_lines)}')
+    if proc.poll() is not None and proc.returncode != 0:
+        stderr_reader.join(timeout=1)
+        raise RuntimeError(f'Subprocess failed: {"".join(stderr_lines)}')
+    return proc
@@ -1,32 +1,70 @@
 import asyncio
-import json
+import inspect
+import re
 import time
-from functools import wraps
+from functools import lru_cache, wraps
 from typing import List
+import orjson
 from a2a.types import Part
 
 from app.agent.state import AgentState, CubeAssistBaseState
 from app.utils.agent_trace import AgentTrace
 from app.utils.logging import logger
+from app.utils.settings import SETTINGS
+
+# Trace payload serialization and persistence can be switched off outside DEBUG via TRACE_ENABLED=false
+_TRACE_ENABLED = SETTINGS.app_logging_level == 'DEBUG' or str(SETTINGS.trace_enabled).lower() == 'true'
+_TOKEN_RE = re.compile(r'"token"\s*:\s*"[^"]*"')
+
+
+@lru_cache(maxsize=4096)
+def _get_trace(context_id: str, agent_name: str) -> AgentTrace:
+    """Shared AgentTrace per conversation; least recently used ones fall out once the cache is full"""
+    return AgentTrace(context_id=context_id, agent_name=agent_name)
+
+
+def _dump_masked_parts(parts: List[Part]) -> str:
+    """JSON array of the parts with any token value masked"""
+    return _TOKEN_RE.sub('"token":"****"', '[' + ','.join(part.model_dump_json() for part in parts) + ']')
+
+
+def _state_param(func):
+    """Position and name of the first parameter annotated with a CubeAssistBaseState type, if any"""
+    for idx, param in enumerate(inspect.signature(func).parameters.values()):
+        annotation = param.annotation
+        if isinstance(annotation, str):
+            if annotation.rsplit('.', 1)[-1] in ('CubeAssistBaseState', 'AgentState'):
+                return idx, param.name
+        elif isinstance(annotation, type) and issubclass(annotation, CubeAssistBaseState):
+            return idx, param.name
+    return None, None
 
 
 def timed(log_label: str):
     def decorator(func):
+        state_idx, state_name = _state_param(func)
+
+        def get_state(args, kwargs):
+            # args here includes self, matching the positions in func's signature
+            if state_idx is None:
+                # No annotated state parameter: find it by type, as for unannotated signatures
+                return next((a for a in args if isinstance(a, CubeAssistBaseState)), None)
+            if state_idx < len(args):
+                return args[state_idx]
+            return kwargs.get(state_name)
+
         if asyncio.iscoroutinefunction(func):
             @wraps(func)
             async def async_wrapper(*args, **kwargs):
-                start = time.time()
+                start = time.perf_counter()
                 try:
                     result = await func(*args, **kwargs)
                     return result
                 finally:
-                    duration = time.time() - start
-                    state = next((a for a in args if isinstance(a, CubeAssistBaseState)), None)
+                    duration = time.perf_counter() - start
+                    state = get_state(args, kwargs)
                     if state:
-                        if state:
-                            msg = f"{log_label} - {state.selected_tool} for step - {state.step} execution time: {duration:.2f} seconds"
-                        else:
-                            msg = f"{log_label} for step - {state.step} execution time: {duration:.2f} seconds"
+                        msg = f"{log_label} - {state.selected_tool} for step - {state.step} execution time: {duration:.2f} seconds"
                         state.event_log.append(msg)
                     else:
                         msg = f"{log_label} execution time: {duration:.2f} seconds"
@@ -35,14 +73,14 @@ def timed(log_label: str):
         else:
             @wraps(func)
             def wrapper(self, *args, **kwargs):
-                start = time.time()
+                start = time.perf_counter()
                 try:
                     result = func(self, *args, **kwargs)
                     return result
                 finally:
-                    duration = time.time() - start
-                    state = next((a for a in args if isinstance(a, CubeAssistBaseState)), None)
-                    if state: 
+                    duration = time.perf_counter() - start
+                    state = get_state((self, *args), kwargs)
+                    if state:
                         msg = f"{log_label} for step - {state.step} execution time: {duration:.2f} seconds"
                         state.event_log.append(msg)
                     else:
@@ -62,16 +100,13 @@ def trace_agent_interaction(log_label: str):
                 return result
             finally:
                 duration = time.time() - start
-                input_payload_list = []
-                for payload_item in agent_input:
-                    payload_item_dump=payload_item.model_dump()
-                    if payload_item_dump.get('data',{}).get('token'):
-                        payload_item_dump['data']['token'] = "****"
-                    input_payload_list.append(payload_item_dump)
-                input_payload=json.dumps(input_payload_list)
-                msg = f"{log_label} for step - {state.step} executing agent {selected_agent.get("name")} , paramaters: {input_payload} execution time: {duration:.2f} seconds"
-                agent_trace = AgentTrace(context_id=state.context_id, agent_name=state.agent_name)
-                agent_trace.save_agent_interaction_trace(state.task_id, input_payload, json.dumps(state.output), state.status, duration , selected_agent.get("name"))
+                if _TRACE_ENABLED:
+                    input_payload = _dump_masked_parts(agent_input)
+                    msg = f"{log_label} for step - {state.step} executing agent {selected_agent.get("name")} , paramaters: {input_payload} execution time: {duration:.2f} seconds"
+                    agent_trace = _get_trace(state.context_id, state.agent_name)
+                    agent_trace.save_agent_interaction_trace(state.task_id, input_payload, orjson.dumps(state.output, option=orjson.OPT_NON_STR_KEYS, default=str).decode(), state.status, duration , selected_agent.get("name"))
+                else:
+                    msg = f"{log_label} for step - {state.step} executing agent {selected_agent.get("name")} execution time: {duration:.2f} seconds"
                 state.event_log.append(msg)
                 logger.debug({'message': msg, 'agent_output': result})
         return wrapper
@@ -88,11 +123,18 @@ def trace_mcp_interaction(log_label: str):
                 return result
             finally:
                 duration = time.time() - start
-                satinized_input = tool_input
-                satinized_input['token'] = "****"  # Mask sensitive token info
-                msg = f"{log_label} for step - {state.step} executing tool {state.selected_tool} , paramaters: {satinized_input} execution time: {duration:.2f} seconds"
-                agent_trace = AgentTrace(context_id=state.context_id, agent_name=state.agent_name)
-                agent_trace.save_agent_mcp_interaction_trace(state.task_id, state.selected_tool, satinized_input, result , state.status, duration)
+                if _TRACE_ENABLED:
+                    if isinstance(tool_input, dict) and 'token' in tool_input:
+                        # Mask sensitive token info on a copy; the caller's dict is left untouched
+                        satinized_input = {**tool_input, 'token': '****'}
+                    else:
+                        satinized_input = tool_input
+                    input_payload = orjson.dumps(satinized_input, option=orjson.OPT_NON_STR_KEYS, default=str).decode()
+                    msg = f"{log_label} for step - {state.step} executing tool {state.selected_tool} , paramaters: {input_payload} execution time: {duration:.2f} seconds"
+                    agent_trace = _get_trace(state.context_id, state.agent_name)
+                    agent_trace.save_agent_mcp_interaction_trace(state.task_id, state.selected_tool, input_payload, result , state.status, duration)
+                else:
+                    msg = f"{log_label} for step - {state.step} executing tool {state.selected_tool} execution time: {duration:.2f} seconds"
                 state.event_log.append(msg)
                 logger.debug({'message': msg, 'tool_output': result})
         return wrapper
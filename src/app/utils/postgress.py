@@ -1,45 +1,186 @@
+import asyncio
+import threading
 import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
 
+import orjson
 import psycopg2
+from psycopg2.extensions import register_adapter
+from psycopg2.extras import Json, execute_values, register_default_json, register_default_jsonb
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 
 from .logging import logger
 from .settings import SETTINGS
 
 
+def _json_dumps(obj) -> str:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def json_param(value):
+    """Adapt any JSON-serializable value (e.g. a list) for a json/jsonb parameter; None stays NULL"""
+    return None if value is None else Json(value, dumps=_json_dumps)
+
+
+# dict parameters are sent as JSON literals serialized with orjson, so jsonb columns need no ::jsonb cast
+register_adapter(dict, json_param)
+
+
+class _Connection(psycopg2.extensions.connection):
+    """Pooled connection: decodes JSON with orjson and remembers the server-side prepared statements it holds"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        # Decode json/jsonb columns with orjson; the OIDs are fixed, so this costs no round-trip
+        register_default_json(conn_or_curs=self, loads=orjson.loads)
+        register_default_jsonb(conn_or_curs=self, loads=orjson.loads)
+
+
+class _BlockingPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool whose getconn waits for a free connection instead of raising PoolError when exhausted"""
+    def __init__(self, minconn, maxconn, *args, timeout=30, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._timeout = timeout
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise PoolError(f'no database connection became available within {self._timeout} seconds')
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+@lru_cache(maxsize=128)
+def _to_positional(query: str) -> str:
+    """Rewrite %s placeholders as $1, $2, ... for PREPARE"""
+    parts = query.split('%s')
+    return parts[0] + ''.join(f'${i}{part}' for i, part in enumerate(parts[1:], start=1))
+
+
+_POOL: Optional[_BlockingPool] = None
+_POOL_LOCK = threading.Lock()
+
+# Connection borrowed by an active Postgress.transaction(), with the (thread, task) that owns it.
+# asyncio.create_task and asyncio.to_thread copy context variables, so the owner is checked before use:
+# a copied context must not keep using a connection that may already be back in the pool.
+_CURRENT_CONN: ContextVar[Optional[tuple]] = ContextVar('pg_conn', default=None)
+
+
+def _owner() -> tuple:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return threading.get_ident(), task
+
+
+def _current_conn() -> Optional[psycopg2.extensions.connection]:
+    """Connection of the enclosing transaction(), if it was opened by this thread and task"""
+    current = _CURRENT_CONN.get()
+    if current is None or current[1] != _owner():
+        return None
+    return current[0]
+
+
 class Postgress:
-    def get_connection(self, retries=3, delay=2):
-        attempt = 0
-        while attempt < retries:
-            try:
-                conn = psycopg2.connect(
-                    host=SETTINGS.agent_db_host,
-                    database=SETTINGS.agent_db_name,
-                    user=SETTINGS.agent_db_user,
-                    password=SETTINGS.agent_db_password,
-                    port=SETTINGS.agent_db_port,
-                )
-                with conn.cursor() as cur:
-                    cur.execute('CREATE EXTENSION IF NOT EXISTS vector;')
+    def get_pool(self, retries=3, delay=2) -> _BlockingPool:
+        global _POOL
+        if _POOL is not None:
+            return _POOL
+        with _POOL_LOCK:
+            attempt = 0
+            while _POOL is None:
+                try:
                     # Include workflow schema first, then existing schemas
                     search_path = f'{SETTINGS.workflow_schema},pipeline,{SETTINGS.cube_assist_schema},public'
-                    cur.execute(f'SET search_path TO {search_path};')
-                    conn.commit()
-                return conn
-            except psycopg2.OperationalError as e:
-                if 'password authentication failed' in str(e):
-                    logger.error('Database connection failed: password authentication failed.')
-                    attempt += 1
-                    SETTINGS.reload()
-                    if attempt < retries:
+                    # search_path is applied by the server during the startup handshake; the vector
+                    # extension is created once at deploy time by scripts/bootstrap_db.py
+                    _POOL = _BlockingPool(
+                        minconn=2,
+                        maxconn=int(SETTINGS.db_pool_max),
+                        timeout=float(SETTINGS.db_pool_timeout),
+                        host=SETTINGS.agent_db_host,
+                        database=SETTINGS.agent_db_name,
+                        user=SETTINGS.agent_db_user,
+                        password=SETTINGS.agent_db_password,
+                        port=SETTINGS.agent_db_port,
+                        options=f'-c search_path={search_path}',
+                        connection_factory=_Connection,
+                    )
+                except psycopg2.OperationalError as e:
+                    if 'password authentication failed' in str(e):
+                        logger.error('Database connection failed: password authentication failed.')
+                        attempt += 1
+                        SETTINGS.reload()
+                        if attempt >= retries:
+                            raise
                         logger.info(f'Retrying database connection (attempt {attempt + 1}/{retries}) in {delay} seconds...')
                         time.sleep(delay)
-                else:
-                    raise
+                    else:
+                        raise
+        return _POOL
+
+    @staticmethod
+    def _discard_pool(pool: _BlockingPool) -> None:
+        global _POOL
+        with _POOL_LOCK:
+            if _POOL is pool:
+                _POOL = None
+
+    def _getconn(self):
+        pool = self.get_pool()
+        try:
+            return pool, pool.getconn()
+        except psycopg2.OperationalError as e:
+            if 'password authentication failed' not in str(e):
+                raise
+            # Credentials rotated after the pool was opened; rebuild it from reloaded settings
+            logger.error('Database connection failed: password authentication failed.')
+            SETTINGS.reload()
+            self._discard_pool(pool)
+            pool = self.get_pool()
+            return pool, pool.getconn()
+
+    @contextmanager
+    def transaction(self):
+        """Run every execute_query in the block on one pooled connection, committed once on exit"""
+        conn = _current_conn()
+        if conn is not None:
+            yield conn
+            return
+        pool, conn = self._getconn()
+        token = _CURRENT_CONN.set((conn, _owner()))
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            _CURRENT_CONN.reset(token)
+            pool.putconn(conn)
 
     def execute_query(self, query, params=None, fetch=False):
-        conn = None
+        conn = _current_conn()
+        if conn is not None:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchall() if fetch else None
+
+        pool, conn = self._getconn()
         try:
-            conn = self.get_connection()
             with conn.cursor() as cur:
                 cur.execute(query, params)
                 if fetch:
@@ -49,5 +190,57 @@ class Postgress:
                 conn.commit()
                 return result
         finally:
-            if conn:
-                conn.close()
+            # putconn rolls back an unfinished transaction and discards closed connections
+            pool.putconn(conn)
+
+    def execute_prepared(self, name, query, params=(), fetch=False):
+        """
+        Run a %s-parameterized query as a named server-side prepared statement, preparing it
+        once per pooled connection. Falls back to execute_query when pgbouncer pools per
+        transaction/statement, where prepared statements do not survive between checkouts.
+        """
+        if str(SETTINGS.db_pool_mode).lower() != 'session':
+            return self.execute_query(query, params, fetch=fetch)
+
+        def run(conn):
+            with conn.cursor() as cur:
+                if name not in conn.prepared:
+                    cur.execute(f'PREPARE {name} AS {_to_positional(query)}')
+                    conn.prepared.add(name)
+                if params:
+                    cur.execute(f'EXECUTE {name} ({", ".join(["%s"] * len(params))})', params)
+                else:
+                    cur.execute(f'EXECUTE {name}')
+                return cur.fetchall() if fetch else None
+
+        conn = _current_conn()
+        if conn is not None:
+            return run(conn)
+
+        pool, conn = self._getconn()
+        try:
+            result = run(conn)
+            conn.commit()
+            return result
+        finally:
+            pool.putconn(conn)
+
+    def execute_values(self, query, rows, template=None, page_size=100):
+        """Insert many rows with multi-row VALUES statements; query must contain a single `VALUES %s`"""
+        pool, conn = self._getconn()
+        try:
+            with conn.cursor() as cur:
+                execute_values(cur, query, rows, template=template, page_size=page_size)
+                conn.commit()
+        finally:
+            pool.putconn(conn)
+
+    def copy_expert(self, sql, file):
+        """Stream rows from a file-like object with COPY ... FROM STDIN"""
+        pool, conn = self._getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(sql, file)
+                conn.commit()
+        finally:
+            pool.putconn(conn)
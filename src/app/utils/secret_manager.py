@@ -1,14 +1,61 @@
-import json
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Mapping
 
-import boto3
+import orjson
+from botocore.exceptions import ClientError
+
+from .aws import boto_client
 
 class SecretManager:
 
     @staticmethod
-    def get_secrets(aws_region: str, secret_id: str) -> dict:
-        session = boto3.session.Session()
-        client = session.client(service_name = "secretsmanager", region_name = aws_region)
+    def get_secrets(aws_region: str, secret_id: str) -> Mapping:
+        client = boto_client("secretsmanager", aws_region)
         get_secret_value_response = client.get_secret_value(SecretId = secret_id)
         if "SecretString" in get_secret_value_response:
-            secret_dict = json.loads(get_secret_value_response["SecretString"])
-            return secret_dict
+            secret_dict = orjson.loads(get_secret_value_response["SecretString"])
+            # read-only view so one parsed secret can be shared safely
+            return MappingProxyType(secret_dict)
+
+    @staticmethod
+    def get_secrets_batch(aws_region: str, secret_ids: list[str]) -> dict[str, Mapping]:
+        """Fetch several secrets in one round-trip, keyed by the requested secret id"""
+        client = boto_client("secretsmanager", aws_region)
+        try:
+            response = client.batch_get_secret_value(SecretIdList = list(secret_ids))
+        except ClientError:
+            # e.g. the role lacks secretsmanager:BatchGetSecretValue; fall back to one concurrent call per secret
+            with ThreadPoolExecutor(max_workers=max(1, len(secret_ids))) as executor:
+                values = executor.map(lambda secret_id: SecretManager.get_secrets(aws_region, secret_id), secret_ids)
+                secrets = dict(zip(secret_ids, values))
+        else:
+            if response.get("Errors"):
+                errors = ", ".join(f"{e.get('SecretId')}: {e.get('ErrorCode')}" for e in response["Errors"])
+                raise RuntimeError(f"Failed to fetch secrets: {errors}")
+            secrets = SecretManager._by_requested_id(secret_ids, response.get("SecretValues", []))
+
+        missing = [secret_id for secret_id in secret_ids if secrets.get(secret_id) is None]
+        if missing:
+            raise RuntimeError(f"Secrets not returned or without a SecretString: {', '.join(missing)}")
+        return secrets
+
+    @staticmethod
+    def _by_requested_id(secret_ids: list[str], secret_values: list[dict]) -> dict[str, Mapping]:
+        """Key batch results by the id each was requested with (a name, a full ARN or a partial ARN)"""
+        matched, unmatched = {}, []
+        for secret_value in secret_values:
+            name, arn = secret_value.get("Name"), secret_value.get("ARN") or ""
+            # A partial ARN is the full ARN without its random suffix
+            secret_id = next((sid for sid in secret_ids if sid not in matched and (sid == name or arn.startswith(sid))), None)
+            if secret_id is None:
+                unmatched.append(secret_value)
+            else:
+                matched[secret_id] = secret_value
+        # Anything else is paired with the still-unmatched ids in request order
+        matched.update(zip([sid for sid in secret_ids if sid not in matched], unmatched))
+        return {
+            secret_id: MappingProxyType(orjson.loads(secret_value["SecretString"]))
+            for secret_id, secret_value in matched.items()
+            if "SecretString" in secret_value
+        }
@@ -35,6 +35,7 @@ class Settings:
     #application / agent keys
     logging_level = os.environ.get("LOGGING_LEVEL", "DEBUG")
     app_logging_level = os.environ.get("APP_LOGGING_LEVEL", "INFO")
+    trace_enabled = os.environ.get("TRACE_ENABLED", "true")
     app_name = os.environ.get('APP_NAME') 
     env = os.environ.get('ENV','local')
     agent_db_host = os.environ.get('DB_HOST')
@@ -42,6 +43,11 @@ class Settings:
     agent_db_name = os.environ.get('DB_NAME')
     agent_db_user = os.environ.get('DB_USER')
     agent_db_password = os.environ.get('DB_PASSWORD')
+    db_pool_max = os.environ.get('DB_POOL_MAX', 10)
+    # seconds a caller waits for a free pooled connection before giving up
+    db_pool_timeout = os.environ.get('DB_POOL_TIMEOUT', 30)
+    # pgbouncer pool mode in front of the database; server-side prepared statements need 'session' (or no pgbouncer)
+    db_pool_mode = os.environ.get('DB_POOL_MODE', 'session')
     pipeline_token = os.environ.get("PIPELINE_TOKEN")
     a2a_server_url = os.environ.get('A2A_SERVER_URL')
     nso_agent_url = os.environ.get('NSO_AGENT_URL')
@@ -61,15 +67,19 @@ class Settings:
         return self._instance 
 
     def __init__(self):
+        if getattr(self, '_initialized', False):
+            return
 
-        db_secrets = SecretManager.get_secrets(self.aws_region, self.db_secret_id)
+        fetched = SecretManager.get_secrets_batch(self.aws_region, [self.db_secret_id, self.app_secret_id])
+        db_secrets = fetched[self.db_secret_id]
         self.agent_db_user = db_secrets.get('username')
         self.agent_db_password = db_secrets.get('password')
         self.load_from_db()
-        app_secrets = SecretManager.get_secrets(self.aws_region, self.app_secret_id)
+        app_secrets = fetched[self.app_secret_id]
         self.openai_api_key = app_secrets.get('OPENAI_API_KEY')
         self.toyota_llm_client_id = app_secrets.get('TOYOTA_LLM_CLIENT_ID')
         self.toyota_llm_client_secret = app_secrets.get('TOYOTA_LLM_CLIENT_SECRET')
+        self._initialized = True
 
 
     def load_from_db(self):
@@ -91,10 +101,11 @@ class Settings:
                 """
                 cur.execute(query, (self.app_name,))
                 rows = cur.fetchall()
+                known_attrs = frozenset(vars(type(self))) | frozenset(self.__dict__)
                 for row in rows:
                     _, key, value = row
                     key_lower = key.lower()
-                    if hasattr(self, key_lower):
+                    if key_lower in known_attrs:
                         setattr(self, key_lower, value)
                     else:
                         continue
@@ -103,5 +114,8 @@ class Settings:
             conn.close()
 
     def reload(self):
-        Settings._instance = None
+        # _instance keeps pointing at self, so Settings() still returns the reloaded singleton
+        self._initialized = False
+        # Re-read secrets and DB config into this instance, which callers already hold as SETTINGS
+        self.__init__()
 SETTINGS = Settings()
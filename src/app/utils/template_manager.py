@@ -5,9 +5,13 @@ from jinja2 import Environment
 from app.utils.enums import TemplateName, TemplateType
 from app.utils.postgress import Postgress
 
+_ENV = Environment(auto_reload=False, cache_size=400)
+
 class TemplateManager:
     _instance = None
-    _template_cache = {}
+    _loaded = False
+    # (agent_name, template_type, template_name) -> template data
+    _template_cache: dict[tuple[str, str, str], dict] = {}
 
     GET_TEMPLATE_BY_AGENT_NAME = """
         SELECT ts.template_id, ts.name, ts.template_text, ts.version, ts.template_type
@@ -24,18 +28,18 @@ class TemplateManager:
         return cls._instance
 
     def __init__(self, agent_name: str):
-        if len(self._template_cache) == 0:
+        if not self._loaded:
             self._agent_name = agent_name
             self._load_agent_templates()
+            TemplateManager._loaded = True
 
     def get_template(self, template_type: TemplateType, template_name: TemplateName, render: bool = False, **kwargs) -> str:
-        template_data = self._template_cache.get(self._agent_name, {}).get(template_type.value, {}).get(template_name.value, {})
-        prompt_text = template_data.get('prompt_text', '')
+        template_data = self._template_cache.get((self._agent_name, template_type.value, template_name.value))
+        if template_data is None:
+            return ''
         if not render:
-            return prompt_text
-        template_env = Environment()
-        template = template_env.from_string(prompt_text)
-        rendered_template = template.render(**kwargs)
+            return template_data['prompt_text']
+        rendered_template = template_data['template_obj'].render(**kwargs)
         return rendered_template
 
     def render_template(self, template_type: TemplateType, template_name: TemplateName, **kwargs) -> str:
@@ -44,21 +48,14 @@ class TemplateManager:
     def _load_agent_templates(self):
         db = Postgress()
         rows = db.execute_query(self.GET_TEMPLATE_BY_AGENT_NAME, params=(self._agent_name,), fetch=True)
-        self._template_cache[self._agent_name] = {}
         for row in rows:
             template_type = row[4]
             template_name = row[1]
-            if template_type not in self._template_cache[self._agent_name]:
-                self._template_cache[self._agent_name][template_type] = {}
-
-            self._template_cache[self._agent_name][template_type][template_name] = {
+            self._template_cache[(self._agent_name, template_type, template_name)] = {
                 'template_id': row[0],
                 'template_name': row[1],
                 'prompt_text': row[2],
                 'version': row[3],
                 'template_type': row[4],
+                'template_obj': _ENV.from_string(row[2] or ''),
             }
-
-
-
-
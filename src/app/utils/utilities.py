@@ -1,9 +1,12 @@
+import functools
 import json
 import os
+import orjson
 import subprocess
 import time
-from typing import Any, Optional, Dict, List
+from typing import Any, Optional, Dict, Iterable, List
 import re
+from app.utils.aws import boto_client, forward_port, get_vm_instance
 from app.utils.logging import logger
 
 import boto3
@@ -17,6 +20,57 @@ except ImportError:
     from jsonpath2 import Path
     JSONPATH_AVAILABLE = False
 
+# $.field - a direct child of the root, resolved without jsonpath-ng
+_SIMPLE_RE = re.compile(r'\$\.([A-Za-z_][A-Za-z0-9_]*)\Z')
+
+# $.array[?(@.field == $..reference)].target
+_COMPLEX_FILTER_RE = re.compile(r'\$\.([^[]+)\[\?\(@\.([^=\s]+)\s*==\s*(\$\.\.?[^\]]+)\)\]\.(.+)')
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_path(path: str, ext: bool):
+    """Parsed jsonpath-ng expression; the extended parser is needed for filter expressions"""
+    return jsonpath_ext_parse(path) if ext else jsonpath_parse(path)
+
+
+_NO_MATCH = object()
+
+
+def _unwrap_matches(values: Iterable[Any]) -> Any:
+    """None for no values, the value itself for exactly one, otherwise a list of all of them"""
+    it = iter(values)
+    first = next(it, _NO_MATCH)
+    if first is _NO_MATCH:
+        return None
+    second = next(it, _NO_MATCH)
+    if second is _NO_MATCH:
+        return first
+    return [first, second, *it]
+
+
+@functools.singledispatch
+def _resolve(node: Any, resolve_string) -> Any:
+    """Rebuild a tool_input tree, passing every string leaf through resolve_string"""
+    # Other types (int, float, bool, None) - return as-is
+    return node
+
+
+@_resolve.register
+def _resolve_str(node: str, resolve_string) -> Any:
+    return resolve_string(node)
+
+
+@_resolve.register
+def _resolve_dict(node: dict, resolve_string) -> dict:
+    # String leaves are by far the most common children; skip the dispatch for them
+    return {key: resolve_string(value) if type(value) is str else _resolve(value, resolve_string)
+            for key, value in node.items()}
+
+
+@_resolve.register
+def _resolve_list(node: list, resolve_string) -> list:
+    return [resolve_string(item) if type(item) is str else _resolve(item, resolve_string) for item in node]
+
 
 class Utilities:
     
@@ -25,65 +79,79 @@ class Utilities:
         if payload is None:
             return None
         try:
-            return json.dumps(payload, ensure_ascii=False)
+            # orjson emits UTF-8 without escaping, matching ensure_ascii=False
+            return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS).decode()
         except Exception:
             return None
 
-    @staticmethod    
-    def start_port_forwarding(host, remote_port, local_port, aws_region, sleep_time: int = 2) -> any:
-        server_cmd = [
-            'aws', 'ssm', 'start-session',
-            '--region', aws_region,
-            '--target', Utilities.get_vm_instance(aws_region),
-            '--document-name', 'AWS-StartPortForwardingSessionToRemoteHost',
-            '--parameters', f'host={host},portNumber={remote_port},localPortNumber={local_port}',
+    @staticmethod
+    def start_port_forwarding(host, remote_port, local_port, aws_region, timeout: float = 30) -> any:
+        """
+        Open an SSM port-forwarding session with boto3 and run only the WebSocket leg through
+        session-manager-plugin, instead of starting the aws CLI for every tunnel.
+        """
+        target = get_vm_instance(aws_region)
+        parameters = {
+            'Target': target,
+            'DocumentName': 'AWS-StartPortForwardingSessionToRemoteHost',
+            'Parameters': {'host': [host], 'portNumber': [str(remote_port)], 'localPortNumber': [str(local_port)]},
+        }
+        session = boto_client('ssm', aws_region).start_session(**parameters)
+        # Same arguments the aws CLI hands to the plugin: session, region, operation, profile, request, endpoint
+        plugin_cmd = [
+            'session-manager-plugin',
+            json.dumps(session),
+            aws_region,
+            'StartSession',
+            '',
+            json.dumps(parameters),
+            f'https://ssm.{aws_region}.amazonaws.com',
         ]
-        return Utilities.forward_port(server_cmd, sleep_time)
+        return forward_port(plugin_cmd, timeout)
 
     @staticmethod
     def _resolve_recursive_reference(data: dict, ref_path: str) -> Any:
         """
         Resolve references like $..selected_order_id or $.selected_order_id in the data
         """
-        from app.utils.logging import logger
-
         if ref_path.startswith('$..'):
             field_name = ref_path[3:]
-            # Recursive search
-            def find_field_recursive(obj, field):
-                results = []
-                if isinstance(obj, dict):
-                    if field in obj:
-                        results.append(obj[field])
-                    for value in obj.values():
-                        results.extend(find_field_recursive(value, field))
-                elif isinstance(obj, list):
-                    for item in obj:
-                        results.extend(find_field_recursive(item, field))
-                return results
-            results = find_field_recursive(data, field_name)
+            result = Utilities._find_first_field(data, field_name)
         elif ref_path.startswith('$.'):
             # Direct child of root
             field_name = ref_path[2:]
-            results = [data.get(field_name)] if field_name in data else []
+            result = data.get(field_name)
         else:
             logger.warning(f"Reference path '{ref_path}' not supported")
             return None
 
-        logger.debug(f"Resolved reference '{ref_path}' -> {results}")
-        return results[0] if results else None
+        logger.debug(f"Resolved reference '{ref_path}' -> {result}")
+        return result
+
+    @staticmethod
+    def _find_first_field(obj: Any, field: str) -> Any:
+        """
+        Value of the first `field` key in depth-first document order, without recursion and
+        stopping at the first hit
+        """
+        stack = [obj]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, dict):
+                if field in current:
+                    return current[field]
+                stack.extend(reversed(current.values()))
+            elif isinstance(current, list):
+                stack.extend(reversed(current))
+        return None
 
     @staticmethod
     def _handle_complex_filter(data: dict, json_path: str) -> List[Any]:
         """
         Handle complex filter expressions manually when JSONPath library fails
         """
-        from app.utils.logging import logger
-        
         try:
-            # Fixed pattern - removed problematic boundaries
-            filter_pattern = r'\$\.([^[]+)\[\?\(@\.([^=\s]+)\s*==\s*(\$\.\.?[^\]]+)\)\]\.(.+)'
-            match = re.match(filter_pattern, json_path)
+            match = _COMPLEX_FILTER_RE.match(json_path)
             
             if not match:
                 logger.warning(f"Complex filter pattern not recognized: {json_path}")
@@ -139,7 +207,10 @@ class Utilities:
         if not json_path:
             return None
 
-        from app.utils.logging import logger
+        # Fast path for the common '$.field' case: a dict lookup gives the same result as jsonpath-ng
+        simple = _SIMPLE_RE.match(json_path)
+        if simple and isinstance(data, dict):
+            return data.get(simple.group(1))
         
         try:
             # Handle complex filter expressions manually
@@ -157,24 +228,10 @@ class Utilities:
 
             try:
                 # Use extended parser for filter expressions
-                if '[?' in json_path:
-                    jsonpath_expr = jsonpath_ext_parse(json_path)
-                else:
-                    jsonpath_expr = jsonpath_parse(json_path)
-                
-                matches = jsonpath_expr.find(data)
-                
-                if not matches:
-                    return None
-                
-                # Extract values
-                results = [match.value for match in matches]
+                jsonpath_expr = _compile_path(json_path, '[?' in json_path)
                 
                 # Return single value if only one match, otherwise return list
-                if len(results) == 1:
-                    return results[0]
-                else:
-                    return results
+                return _unwrap_matches(match.value for match in jsonpath_expr.find(data))
                     
             except Exception as e:
                 logger.warning(f"jsonpath-ng failed for '{json_path}': {e}, trying fallback")
@@ -184,17 +241,7 @@ class Utilities:
             # Fallback to jsonpath2
             try:
                 path = Path.parse_str(json_path)
-                matches = list(path.match(data))
-                
-                if not matches:
-                    return None
-                
-                results = [match.current_value for match in matches]
-                
-                if len(results) == 1:
-                    return results[0]
-                else:
-                    return results
+                return _unwrap_matches(match.current_value for match in path.match(data))
                     
             except Exception as e:
                 logger.warning(f"jsonpath2 also failed for '{json_path}': {e}")
@@ -210,29 +257,18 @@ class Utilities:
         Recursively resolve JSONPath expressions in tool parameters using workflow state data.
         Now supports complex JSONPath expressions with filters, comparisons, and recursive descent.
         """
-        from app.utils.logging import logger
-        
         def is_jsonpath_expression(value: str) -> bool:
             """Check if a string looks like a JSONPath expression"""
-            if not isinstance(value, str):
+            if not isinstance(value, str) or not value:
                 return False
-            
-            # Enhanced JSONPath patterns including complex expressions
-            jsonpath_patterns = [
-                value.startswith('$.'),           # $.field.subfield
-                value.startswith('$['),           # $[0].field or $['key']
-                value == '$',                     # Root reference
-                value.startswith('$..'),          # Recursive descent
-                '[?' in value,                    # Filter expressions
-                '==' in value and '$' in value,   # Comparison expressions
-                '!=' in value and '$' in value,   # Not equal comparisons
-                '<' in value and '$' in value,    # Less than comparisons
-                '>' in value and '$' in value,    # Greater than comparisons
-                '[*]' in value,                   # Wildcard array access
-                '..' in value and '$' in value,   # Recursive descent anywhere
-            ]
-            
-            return any(jsonpath_patterns)
+            # Cheapest checks first; most parameter strings contain no '$' and exit after the next line
+            if '$' not in value:
+                return '[?' in value or '[*]' in value  # Filter expressions / wildcard array access
+            if value == '$' or value.startswith(('$.', '$[')):  # Root, $.field, $..field, $[0]
+                return True
+            # Comparison expressions or recursive descent anywhere
+            return ('==' in value or '!=' in value or '<' in value or '>' in value or '..' in value
+                    or '[?' in value or '[*]' in value)
         
         def resolve_value(value: Any, data: dict) -> Any:
             """Resolve a single value if it's a JSONPath expression"""
@@ -250,36 +286,17 @@ class Utilities:
                     return value
             return value
         
-        # Handle different input types
-        if isinstance(tool_input, dict):
-            resolved_dict = {}
-            for key, value in tool_input.items():
-                if isinstance(value, (dict, list)):
-                    # Recursively process nested structures
-                    resolved_dict[key] = Utilities.resolve_jsonpath_in_params(value, workflow_data)
-                else:
-                    # Try to resolve the value
-                    resolved_dict[key] = resolve_value(value, workflow_data)
-            return resolved_dict
-        
-        elif isinstance(tool_input, list):
-            resolved_list = []
-            for item in tool_input:
-                if isinstance(item, (dict, list)):
-                    # Recursively process nested structures
-                    resolved_list.append(Utilities.resolve_jsonpath_in_params(item, workflow_data))
-                else:
-                    # Try to resolve the item
-                    resolved_list.append(resolve_value(item, workflow_data))
-            return resolved_list
-        
-        elif isinstance(tool_input, str):
-            # Single string value - check if it's a JSONPath
-            return resolve_value(tool_input, workflow_data)
-        
-        else:
-            # Other types (int, float, bool, None) - return as-is
-            return tool_input
+        # Same expression appearing several times in one tool_input is only resolved once
+        resolved_cache = {}
+
+        def resolve_string(value: str) -> Any:
+            if not is_jsonpath_expression(value):
+                return value
+            if value not in resolved_cache:
+                resolved_cache[value] = resolve_value(value, workflow_data)
+            return resolved_cache[value]
+
+        return _resolve(tool_input, resolve_string)
 
     @staticmethod
     def validate_jsonpath_expression(json_path: str, sample_data: dict = None) -> bool:
@@ -288,10 +305,7 @@ class Utilities:
         """
         try:
             if JSONPATH_AVAILABLE:
-                if '[?' in json_path:
-                    jsonpath_ext_parse(json_path)
-                else:
-                    jsonpath_parse(json_path)
+                _compile_path(json_path, '[?' in json_path)
             else:
                 Path.parse_str(json_path)
             
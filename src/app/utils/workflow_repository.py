@@ -14,19 +14,20 @@ class WorkflowRepository:
     def __init__(self):
         self.db = Postgress()
 
-    def get_workflow_with_steps(self, workflow_id: str, user_role: str) -> Optional[List[Tuple]]:
+    def get_workflow_with_steps(self, workflow_id: str, user_role: str) -> Optional[Tuple[Tuple, List[Tuple]]]:
         """
         Retrieve workflow details along with its steps by workflow_id from database.
-        Joins workflows and steps tables, including USER_INPUT and SYSTEM_ACTION step details.
+        The workflow header and its steps (with USER_INPUT and SYSTEM_ACTION step details) are
+        read with two queries on one connection, so header columns are not repeated on every step row.
         
         Args:
             workflow_id: Unique workflow identifier
             user_role: User role to check access permissions
             
         Returns:
-            Raw database result rows or None if not found/accessible
+            (header_row, step_rows) or None if not found/accessible
         """
-        query = """
+        header_query = """
         SELECT 
             w.workflow_id, 
             w.name, 
@@ -34,18 +35,29 @@ class WorkflowRepository:
             w.access_roles,
             w.is_enabled,
             w.workflow_exit_keywords,
-            w.created_at AS workflow_created_at, 
+            to_char(w.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"') AS workflow_created_at, 
             w.created_by AS workflow_created_by, 
-            w.updated_at AS workflow_updated_at, 
-            w.updated_by AS workflow_updated_by,
+            to_char(w.updated_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"') AS workflow_updated_at, 
+            w.updated_by AS workflow_updated_by
+        FROM workflows w
+        WHERE w.workflow_id = %s
+        AND EXISTS (
+            SELECT 1
+            FROM jsonb_array_elements_text(access_roles[1]::jsonb) AS role
+            WHERE role.value = %s
+        )
+        AND w.is_enabled = TRUE
+        """
+        steps_query = """
+        SELECT 
             s.step_id,
             s.type,
             s.task_description,
             s.failure_message,
             s.next_step_id,
-            s.created_at AS step_created_at,
+            to_char(s.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"') AS step_created_at,
             s.created_by AS step_created_by,
-            s.updated_at AS step_updated_at,
+            to_char(s.updated_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"') AS step_updated_at,
             s.updated_by AS step_updated_by,
             ui.user_message,
             ui.expected_data_key,
@@ -57,30 +69,24 @@ class WorkflowRepository:
             sa.success_mapping,
             sa.error_mapping,
             sa.type AS action_type
-        FROM workflows w
-        LEFT JOIN steps s ON w.workflow_id = s.workflow_id
+        FROM steps s
         LEFT JOIN step_user_interaction ui ON s.step_id = ui.step_id AND s.type IN ('USER_INPUT','FINAL_RESPONSE')
         LEFT JOIN step_system_action sa ON s.step_id = sa.step_id AND s.type = 'SYSTEM_ACTION'
-        WHERE w.workflow_id = %s
-        AND EXISTS (
-            SELECT 1
-            FROM jsonb_array_elements_text(access_roles[1]::jsonb) AS role
-            WHERE role.value = %s
-        )
-        AND w.is_enabled = TRUE
+        WHERE s.workflow_id = %s
         ORDER BY s.step_id
         """
         
-        params = (workflow_id, user_role)
-        
         try:
-            result = self.db.execute_query(query, params, fetch=True)
-            
-            if not result or len(result) == 0:
-                logger.warning(f"Workflow '{workflow_id}' not found or user role '{user_role}' does not have access")
-                return None
+            with self.db.transaction():
+                header = self.db.execute_prepared('wf_get_with_steps', header_query, (workflow_id, user_role), fetch=True)
                 
-            return result
+                if not header:
+                    logger.warning(f"Workflow '{workflow_id}' not found or user role '{user_role}' does not have access")
+                    return None
+
+                steps = self.db.execute_prepared('wf_get_steps', steps_query, (workflow_id,), fetch=True)
+                
+            return header[0], steps
             
         except Exception as e:
             logger.error(f"Failed to get workflow by ID '{workflow_id}': {e}", exc_info=True)
@@ -96,6 +102,19 @@ class WorkflowRepository:
         Returns:
             List of database result rows for workflows accessible to the user role
         """
+        return self.get_workflows_for_roles([user_role])
+
+    def get_workflows_for_roles(self, user_roles: List[str]) -> List[Tuple]:
+        """
+        Retrieve all workflows accessible by any of the given user roles in a single query.
+        Each workflow is returned once, however many of the roles grant access to it.
+        
+        Args:
+            user_roles: User roles to check access permissions
+            
+        Returns:
+            List of database result rows for workflows accessible to any of the user roles
+        """
         query = """
         SELECT 
             w.workflow_id, 
@@ -104,9 +123,9 @@ class WorkflowRepository:
             w.access_roles,
             w.is_enabled,
             w.workflow_exit_keywords,
-            w.created_at, 
+            to_char(w.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"') AS created_at, 
             w.created_by, 
-            w.updated_at, 
+            to_char(w.updated_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"') AS updated_at, 
             w.updated_by,
             COUNT(s.step_id) as step_count
         FROM workflows w
@@ -114,7 +133,7 @@ class WorkflowRepository:
         WHERE EXISTS (
             SELECT 1
             FROM jsonb_array_elements_text(access_roles[1]::jsonb) AS role
-            WHERE role.value = %s
+            WHERE role.value = ANY(%s)
         )
         AND w.is_enabled = TRUE
         GROUP BY w.workflow_id, w.name, w.description, w.access_roles, w.is_enabled, w.workflow_exit_keywords,
@@ -122,19 +141,19 @@ class WorkflowRepository:
         ORDER BY w.name
         """
         
-        params = (user_role,)
+        params = (list(user_roles),)
         
         try:
-            result = self.db.execute_query(query, params, fetch=True)
+            result = self.db.execute_prepared('wf_list_for_roles', query, params, fetch=True)
             
             if not result or len(result) == 0:
-                logger.info(f"No workflows found for user role '{user_role}'")
+                logger.info(f"No workflows found for user roles {user_roles}")
                 return []
                 
             return result
             
         except Exception as e:
-            logger.error(f"Failed to get workflows for role '{user_role}': {e}", exc_info=True)
+            logger.error(f"Failed to get workflows for roles {user_roles}: {e}", exc_info=True)
             raise
 
     def get_input_required_workflow_run(self, workflow_run_id: str) -> Optional[Tuple]:
@@ -161,7 +180,7 @@ class WorkflowRepository:
         params = (workflow_run_id, TaskState.input_required.value)
         
         try:
-            results = self.db.execute_query(query, params, fetch=True)
+            results = self.db.execute_prepared('wf_input_required', query, params, fetch=True)
             
             if results:
                 logger.info(f"Found input-required step for workflow_run_id: {workflow_run_id}")
@@ -172,4 +191,4 @@ class WorkflowRepository:
                 
         except Exception as e:
             logger.error(f"Failed to get input-required step for workflow_run_id '{workflow_run_id}': {e}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
@@ -1,13 +1,75 @@
-from typing import Optional, List, Dict, Any
+from typing import Callable, Optional, List, Dict, Any, Tuple
 import functools
-import json
+import threading
+from collections import namedtuple
+import orjson
 from functools import partial
+from cachetools import TTLCache
 from langgraph.graph import StateGraph, START, END
 from app.utils.logging import logger
 from app.utils.workflow_repository import WorkflowRepository
 from a2a.types import TaskState
 
 
+# Lean step projection returned by WorkflowService.get_steps_only
+Step = namedtuple('Step', ['step_id', 'type', 'next_step_id', 'user_interaction', 'system_action_details'])
+
+# Step types that carry step_user_interaction details
+_UI_TYPES = frozenset({'USER_INPUT', 'FINAL_RESPONSE'})
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_access_roles(raw: str) -> tuple:
+    """
+    Parse an access_roles string (a JSON array, possibly wrapped as '{"..."}'). Cached because the
+    same role sets repeat across workflows; raises ValueError/TypeError if it is not a JSON array.
+    """
+    return tuple(orjson.loads(raw.strip('{}').strip('"')))
+
+
+@functools.lru_cache(maxsize=1)
+def _get_repository() -> WorkflowRepository:
+    return WorkflowRepository()
+
+
+# Caches live at module level (not on bound methods) so they are shared by every WorkflowService
+# and do not keep service instances alive. Workflow definitions can be edited at runtime, so the
+# caches expire and can be invalidated explicitly (see WorkflowService.invalidate).
+_steps_cache = TTLCache(maxsize=256, ttl=60)
+_steps_only_cache = TTLCache(maxsize=256, ttl=60)
+_workflows_cache = TTLCache(maxsize=256, ttl=60)
+_steps_lock = threading.RLock()
+# Callbacks that drop caches derived from workflows outside this module; see WorkflowService.on_invalidate
+_invalidation_hooks: List[Callable[[], None]] = []
+
+
+_MISSING = object()
+
+
+def _get_or_load(cache: TTLCache, key: tuple, loader):
+    with _steps_lock:
+        value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    # Query outside the lock so a slow fetch does not block lookups for other workflows
+    value = loader(_get_repository(), *key)
+    with _steps_lock:
+        cache[key] = value
+    return value
+
+
+def _fetch_steps(workflow_id: str, user_role: str) -> Optional[Dict[str, Any]]:
+    return _get_or_load(_steps_cache, (workflow_id, user_role), WorkflowService._build_workflow_with_steps)
+
+
+def _fetch_steps_only(workflow_id: str, user_role: str) -> Optional[Tuple[Step, ...]]:
+    return _get_or_load(_steps_only_cache, (workflow_id, user_role), WorkflowService._build_steps_only)
+
+
+def _fetch_all_workflows(user_roles: tuple) -> List[Dict[str, Any]]:
+    return _get_or_load(_workflows_cache, (user_roles,), WorkflowService._build_all_workflows)
+
+
 class WorkflowService:
     """
     Service layer for workflow operations.
@@ -15,9 +77,8 @@ class WorkflowService:
     """
 
     def __init__(self):
-        self.repository = WorkflowRepository()
+        self.repository = _get_repository()
 
-    @functools.lru_cache(maxsize=32)
     def get_steps_by_workflow_id(self, workflow_id: str, user_role: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve workflow details along with its steps by workflow_id from database.
@@ -37,87 +98,158 @@ class WorkflowService:
             raise ValueError("workflow_id is required")
         if not user_role:
             raise ValueError("user_role is required")
+        return _fetch_steps(workflow_id, user_role)
 
+    @staticmethod
+    def _build_workflow_with_steps(repository: WorkflowRepository, workflow_id: str, user_role: str) -> Optional[Dict[str, Any]]:
         # Get raw data from repository
-        result = self.repository.get_workflow_with_steps(workflow_id, user_role)
+        result = repository.get_workflow_with_steps(workflow_id, user_role)
         
         if not result:
             return None
 
-        # Parse access_roles from first row (index 3)
-        access_roles_raw = result[0][3]
+        header, step_rows = result
+        return WorkflowService._to_workflow(header, step_rows, user_role)
+
+    @staticmethod
+    def _to_workflow(header: tuple, step_rows: List[tuple], user_role: str) -> Dict[str, Any]:
+        (workflow_id, name, description, access_roles_raw, is_enabled, workflow_exit_keywords,
+         created_at, created_by, updated_at, updated_by) = header
         access_roles = []
         
         if access_roles_raw:
             try:
                 if isinstance(access_roles_raw, str):
-                    cleaned = access_roles_raw.strip('{}').strip('"')
-                    access_roles = json.loads(cleaned)
+                    access_roles = list(_parse_access_roles(access_roles_raw))
                 elif isinstance(access_roles_raw, list):
                     access_roles = access_roles_raw
-            except (json.JSONDecodeError, ValueError) as e:
+            except (ValueError, TypeError) as e:
                 logger.warning(f"Failed to parse access_roles for workflow {workflow_id}: {e}")
                 access_roles = []
         
         # Build workflow dictionary with new fields
         workflow = {
-            "workflow_id": result[0][0],
-            "name": result[0][1],
-            "description": result[0][2],
+            "workflow_id": workflow_id,
+            "name": name,
+            "description": description,
             "access_roles": access_roles,
-            "is_enabled": result[0][4],  # New field
-            "workflow_exit_keywords": result[0][5],  # New field
-            "created_at": result[0][6].isoformat() if result[0][6] else None,  # Updated index
-            "created_by": result[0][7] if result[0][7] else None,  # Updated index
-            "updated_at": result[0][8].isoformat() if result[0][8] else None,  # Updated index
-            "updated_by": result[0][9] if result[0][9] else None,  # Updated index
+            "is_enabled": is_enabled,
+            "workflow_exit_keywords": workflow_exit_keywords,
+            "created_at": created_at,
+            "created_by": created_by if created_by else None,
+            "updated_at": updated_at,
+            "updated_by": updated_by if updated_by else None,
             "steps": []
         }
         
-        # Parse steps from result rows - updated indices due to new columns
-        for row in result:
-            # Skip if no step (LEFT JOIN returned NULL) - index shifted to 10
-            if row[10] is None:
-                continue
-                
+        # Parse step rows (steps LEFT JOIN user interaction / system action details)
+        for row in step_rows:
+            (step_id, step_type, task_description, failure_message, next_step_id,
+             step_created_at, step_created_by, step_updated_at, step_updated_by) = row[:9]
+
             step = {
-                "step_id": row[10],  # Updated index
-                "type": row[11],     # Updated index
-                "task_description": row[12],  # Updated index
-                "failure_message": row[13],   # Updated index
-                "next_step_id": row[14],      # Updated index
-                "created_at": row[15].isoformat() if row[15] else None,  # Updated index
-                "created_by": row[16] if row[16] else None,  # Updated index
-                "updated_at": row[17].isoformat() if row[17] else None,  # Updated index
-                "updated_by": row[18] if row[18] else None   # Updated index
+                "step_id": step_id,
+                "type": step_type,
+                "task_description": task_description,
+                "failure_message": failure_message,
+                "next_step_id": next_step_id,
+                "created_at": step_created_at,
+                "created_by": step_created_by if step_created_by else None,
+                "updated_at": step_updated_at,
+                "updated_by": step_updated_by if step_updated_by else None
             }
-            
-            # Add USER_INPUT specific details if available - updated indices
-            if row[11] in ('USER_INPUT', 'FINAL_RESPONSE') and row[19] is not None:
-                step["user_interaction"] = {
-                    "user_message": row[19],        # ui.user_message
-                    "expected_data_key": row[20],   # ui.expected_data_key
-                    "validation_regex": row[21],    # ui.validation_regex
-                    "validation_rules": row[22]     # ui.validation_rules
-                }
-            
-            # Add SYSTEM_ACTION specific details if available - updated indices
-            if row[11] == 'SYSTEM_ACTION' and row[23] is not None:
-                step["system_action_details"] = {
-                    "name": row[23],                    # sa.name
-                    "inputs": row[24],                  # sa.inputs
-                    "output_mapping": row[25],          # sa.output_mapping
-                    "success_mapping": row[26],         # sa.success_mapping
-                    "error_mapping": row[27],           # sa.error_mapping
-                    "action_type": row[28]              # sa.type
-                }
-            
+
+            user_interaction, system_action_details = WorkflowService._step_details(row)
+            if user_interaction is not None:
+                step["user_interaction"] = user_interaction
+            if system_action_details is not None:
+                step["system_action_details"] = system_action_details
+
             workflow["steps"].append(step)
         
         logger.info(f"Retrieved workflow: {workflow['name']} with {len(workflow['steps'])} steps for role '{user_role}'")
         return workflow
 
-    @functools.lru_cache(maxsize=32)
+    @staticmethod
+    def _step_details(row: tuple) -> tuple:
+        """(user_interaction, system_action_details) dicts for a step row, None where not applicable"""
+        step_type = row[1]
+        user_interaction = system_action_details = None
+        (user_message, expected_data_key, validation_regex, validation_rules,
+         action_name, action_inputs, output_mapping, success_mapping, error_mapping, action_type) = row[9:]
+
+        # Add USER_INPUT specific details if available
+        if step_type in _UI_TYPES and user_message is not None:
+            user_interaction = {
+                "user_message": user_message,
+                "expected_data_key": expected_data_key,
+                "validation_regex": validation_regex,
+                "validation_rules": validation_rules
+            }
+
+        # Add SYSTEM_ACTION specific details if available
+        if step_type == 'SYSTEM_ACTION' and action_name is not None:
+            system_action_details = {
+                "name": action_name,
+                "inputs": action_inputs,
+                "output_mapping": output_mapping,
+                "success_mapping": success_mapping,
+                "error_mapping": error_mapping,
+                "action_type": action_type
+            }
+        return user_interaction, system_action_details
+
+    def get_steps_only(self, workflow_id: str, user_role: str) -> Optional[Tuple[Step, ...]]:
+        """
+        Lean variant of get_steps_by_workflow_id for the execution engine: only the steps, as Step
+        namedtuples, without the workflow header, audit columns or per-step dicts.
+        
+        Args:
+            workflow_id: Unique workflow identifier (required)
+            user_role: User role to check access permissions (required)
+            
+        Returns:
+            Tuple of Step if the workflow is found and accessible, None otherwise
+            
+        Raises:
+            ValueError: If workflow_id or user_role is not provided
+        """
+        if not workflow_id:
+            raise ValueError("workflow_id is required")
+        if not user_role:
+            raise ValueError("user_role is required")
+        return _fetch_steps_only(workflow_id, user_role)
+
+    @staticmethod
+    def _build_steps_only(repository: WorkflowRepository, workflow_id: str, user_role: str) -> Optional[Tuple[Step, ...]]:
+        result = repository.get_workflow_with_steps(workflow_id, user_role)
+        
+        if not result:
+            return None
+
+        _, step_rows = result
+        return tuple(
+            Step(row[0], row[1], row[4], *WorkflowService._step_details(row))
+            for row in step_rows
+        )
+
+    @staticmethod
+    def invalidate(workflow_id: str) -> None:
+        """Drop cached data of a workflow for every role, e.g. after the workflow was edited"""
+        with _steps_lock:
+            for cache in (_steps_cache, _steps_only_cache):
+                for key in [key for key in cache if key[0] == workflow_id]:
+                    cache.pop(key, None)
+            # Role-keyed workflow lists may include (or should now include) this workflow
+            _workflows_cache.clear()
+        for hook in _invalidation_hooks:
+            hook()
+
+    @staticmethod
+    def on_invalidate(hook: Callable[[], None]) -> None:
+        """Register a callback run by invalidate, for caches built from workflow data elsewhere"""
+        _invalidation_hooks.append(hook)
+
     def get_all_workflows(self, user_roles: tuple) -> List[Dict[str, Any]]:
         """
         Retrieve all workflows accessible by any of the given user roles.
@@ -134,62 +266,48 @@ class WorkflowService:
         """
         if not user_roles or not isinstance(user_roles, tuple):
             raise ValueError("user_roles must be a non-empty tuple")
+        return _fetch_all_workflows(user_roles)
 
+    @staticmethod
+    def _build_all_workflows(repository: WorkflowRepository, user_roles: tuple) -> List[Dict[str, Any]]:
         workflows = []
-        seen_workflow_ids = set()  # Prevent duplicates across roles
-        
-        # Loop through each role and get workflows for that role
-        for user_role in user_roles:
-            try:
-                # Get raw data from repository for each role
-                result = self.repository.get_all_workflows_for_role(user_role)
-                
-                if not result:
-                    logger.info(f"No workflows found for user role '{user_role}'")
-                    continue
-                
-                for row in result:
-                    # Skip duplicates (workflow already added by previous role)
-                    if row[0] in seen_workflow_ids:
-                        continue
-                    seen_workflow_ids.add(row[0])
-                    
-                    # Parse access_roles (index 3)
-                    access_roles_raw = row[3]
+
+        # One query for all roles; each accessible workflow comes back once. Errors propagate so a
+        # transient DB failure is not cached as an empty workflow list.
+        result = repository.get_workflows_for_roles(list(user_roles))
+
+        for row in result:
+            (workflow_id, name, description, access_roles_raw, is_enabled, workflow_exit_keywords,
+             created_at, created_by, updated_at, updated_by, step_count) = row
+
+            access_roles = []
+
+            if access_roles_raw:
+                try:
+                    if isinstance(access_roles_raw, str):
+                        access_roles = list(_parse_access_roles(access_roles_raw))
+                    elif isinstance(access_roles_raw, list):
+                        access_roles = access_roles_raw
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Failed to parse access_roles for workflow {workflow_id}: {e}")
                     access_roles = []
-                    
-                    if access_roles_raw:
-                        try:
-                            if isinstance(access_roles_raw, str):
-                                cleaned = access_roles_raw.strip('{}').strip('"')
-                                access_roles = json.loads(cleaned)
-                            elif isinstance(access_roles_raw, list):
-                                access_roles = access_roles_raw
-                        except (json.JSONDecodeError, ValueError) as e:
-                            logger.warning(f"Failed to parse access_roles for workflow {row[0]}: {e}")
-                            access_roles = []
-                    
-                    workflow = {
-                        "workflow_id": row[0],
-                        "name": row[1],
-                        "description": row[2],
-                        "access_roles": access_roles,
-                        "is_enabled": row[4],  # New field
-                        "workflow_exit_keywords": row[5],  # New field
-                        "created_at": row[6].isoformat() if row[6] else None,  # Updated index
-                        "created_by": row[7] if row[7] else None,  # Updated index
-                        "updated_at": row[8].isoformat() if row[8] else None,  # Updated index
-                        "updated_by": row[9] if row[9] else None,  # Updated index
-                        "step_count": row[10] if row[10] else 0  # Updated index
-                    }
-                    
-                    workflows.append(workflow)
-                    
-            except Exception as e:
-                logger.error(f"Error getting workflows for role '{user_role}': {e}")
-                # Continue with other roles even if one fails
-                continue
-        
+
+            workflow = {
+                "workflow_id": workflow_id,
+                "name": name,
+                "description": description,
+                "access_roles": access_roles,
+                "is_enabled": is_enabled,
+                "workflow_exit_keywords": workflow_exit_keywords,
+                "created_at": created_at,
+                "created_by": created_by if created_by else None,
+                "updated_at": updated_at,
+                "updated_by": updated_by if updated_by else None,
+                "step_count": step_count if step_count else 0
+            }
+
+            workflows.append(workflow)
+
         logger.info(f"Retrieved {len(workflows)} unique workflows across roles {user_roles}")
         return workflows
 
@@ -214,10 +332,11 @@ class WorkflowService:
         if not results:
             return None
 
-        workflow_id = results[0]
-        step_id = results[1]
-        step_run_id = results[2]
-        workflow_state_raw = results[3]
+        return self._to_input_required(results, workflow_run_id)
+
+    @staticmethod
+    def _to_input_required(row: tuple, workflow_run_id: str) -> Dict[str, Any]:
+        workflow_id, step_id, step_run_id, workflow_state_raw = row
         
         # JSONB field returns as dict already - no JSON parsing needed
         workflow_state = workflow_state_raw if workflow_state_raw else {}
@@ -228,4 +347,4 @@ class WorkflowService:
             "step_id": step_id,
             "step_run_id": step_run_id,
             "workflow_state": workflow_state
-        }
\ No newline at end of file
+        }